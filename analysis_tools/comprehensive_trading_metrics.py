@@ -22,27 +22,163 @@ Example:
     python comprehensive_trading_metrics.py backtest_results/rsi_support_resistance
 """
 
+import ast
 import os
 import sys
 import pandas as pd
 import numpy as np
 import warnings
+from dataclasses import dataclass
+
+from zipline_metrics_extractor import load_basic_results
 warnings.filterwarnings("ignore")
 
-def extract_comprehensive_metrics(results_dir):
+# Numba is optional: the fused reduction kernel falls back to NumPy without it
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Display layout for main(): (section title, [(metric key, format spec), ...])
+_PCT = "{:>12.2f}%"
+_MONEY = "${:>12,.2f}"
+_RATIO = "{:>12.4f}"
+_COUNT = "{:>12}"
+
+DISPLAY_SECTIONS = [
+    ("💰 CAPITAL & RETURNS", [
+        ('Initial Capital', _MONEY),
+        ('Ending Capital', _MONEY),
+        ('Net Profit', _MONEY),
+        ('Net Profit %', _PCT),
+        ('Total Return %', _PCT),
+        ('Annualized Return %', _PCT),
+    ]),
+    ("📉 RISK METRICS", [
+        ('Annual Volatility %', _PCT),
+        ('Sharpe Ratio', _RATIO),
+        ('Max Drawdown %', _PCT),
+        ('Calmar Ratio', _RATIO),
+        ('Sortino Ratio', _RATIO),
+        ('Information Ratio', _RATIO),
+    ]),
+    ("📈 TRADING ACTIVITY", [
+        ('Total Trading Days', _COUNT),
+        ('Number of Trades', _COUNT),
+        ('Number of Orders', _COUNT),
+        ('Buy Trades', _COUNT),
+        ('Sell Trades', _COUNT),
+        ('Filled Orders', _COUNT),
+        ('Order Fill Rate %', _PCT),
+    ]),
+    ("💱 TRANSACTION ANALYSIS", [
+        ('Total Transaction Value', _MONEY),
+        ('Total Transaction Costs', _MONEY),
+        ('Average Transaction Cost', _MONEY),
+        ('Winning Days', _COUNT),
+        ('Losing Days', _COUNT),
+        ('Win Rate %', _PCT),
+    ]),
+    ("🎯 PERFORMANCE ANALYSIS", [
+        ('Average Win %', _PCT),
+        ('Average Loss %', _PCT),
+        ('Profit Factor', _RATIO),
+        ('Market Exposure %', _PCT),
+    ]),
+    ("⚠️  RISK ANALYSIS", [
+        ('Value at Risk (95%) %', _PCT),
+        ('Conditional VaR (95%) %', _PCT),
+        ('Treynor Ratio', _RATIO),
+    ]),
+]
+
+@dataclass
+class ReturnStats:
+    """Daily returns as a contiguous array plus the masks and moments shared by the metric steps"""
+    r: np.ndarray
+    pos_mask: np.ndarray
+    neg_mask: np.ndarray
+    mean: float
+    std: float
+
+    @classmethod
+    def from_returns(cls, returns):
+        r = np.ascontiguousarray(np.asarray(returns, dtype=np.float64))
+        return cls(
+            r=r,
+            pos_mask=r > 0,
+            neg_mask=r < 0,
+            mean=float(r.mean()) if r.size else 0.0,
+            std=float(r.std(ddof=1)) if r.size > 1 else 0.0,
+        )
+
+
+def _fused_stats_numpy(r, pv):
+    """NumPy fallback for _fused_stats (one temporary per reduction)."""
+    pos = r > 0
+    neg = r < 0
+    peak = np.maximum.accumulate(pv)
+    max_dd = min(float(((pv - peak) / peak).min()), 0.0)
+    return (r.sum(), (r * r).sum(), r[pos].sum(), int(pos.sum()),
+            r[neg].sum(), int(neg.sum()), int(np.count_nonzero(r)), max_dd)
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _fused_stats(r, pv):
+        """
+        Single pass over daily returns and portfolio values.
+
+        Returns (sum, sum of squares, positive sum, positive count,
+        negative sum, negative count, non-zero count, max drawdown).
+        """
+        n = r.shape[0]
+        s = 0.0
+        s2 = 0.0
+        pos_s = 0.0
+        neg_s = 0.0
+        pos_n = 0
+        neg_n = 0
+        nz = 0
+        peak = pv[0]
+        max_dd = 0.0
+        for i in range(n):
+            x = r[i]
+            s += x
+            s2 += x * x
+            if x > 0:
+                pos_s += x
+                pos_n += 1
+            elif x < 0:
+                neg_s += x
+                neg_n += 1
+            if x != 0:
+                nz += 1
+            if pv[i] > peak:
+                peak = pv[i]
+            dd = (pv[i] - peak) / peak
+            if dd < max_dd:
+                max_dd = dd
+        return s, s2, pos_s, pos_n, neg_s, neg_n, nz, max_dd
+else:
+    _fused_stats = _fused_stats_numpy
+
+def extract_comprehensive_metrics(results_dir, return_stats=False):
     """
     Extract comprehensive trading metrics from Zipline backtest results
+
+    With return_stats=True, returns (metrics, ReturnStats) so later steps can
+    reuse the parsed returns instead of reloading basic_results.csv.
     """
     print(f"🔍 Analyzing results from: {results_dir}")
     
-    # Check if basic_results.csv exists
-    basic_results_path = os.path.join(results_dir, 'basic_results.csv')
-    if not os.path.exists(basic_results_path):
-        print(f"❌ basic_results.csv not found in {results_dir}")
+    # Load basic results (Feather sidecar if the runner wrote one, else basic_results.csv)
+    basic_results = load_basic_results(results_dir, columns=('returns', 'portfolio_value'))
+    if basic_results is None:
+        print(f"❌ basic_results.feather/.csv not found in {results_dir}")
         return None
     
-    # Load basic results
-    basic_results = pd.read_csv(basic_results_path, index_col=0, parse_dates=True)
     print(f"📊 Loaded {len(basic_results)} trading days of data")
     
     # Extract key data
@@ -65,7 +201,6 @@ def extract_comprehensive_metrics(results_dir):
     
     # ============= RETURN METRICS =============
     total_return = (ending_capital / initial_capital) - 1
-    cumulative_returns = (1 + returns).cumprod() - 1
     annual_return = (1 + total_return) ** (252 / len(returns)) - 1
     
     metrics['Total Return'] = total_return
@@ -74,20 +209,25 @@ def extract_comprehensive_metrics(results_dir):
     metrics['Annualized Return %'] = annual_return * 100
     
     # ============= RISK METRICS =============
-    volatility = returns.std() * np.sqrt(252)
-    sharpe_ratio = (returns.mean() / returns.std()) * np.sqrt(252) if returns.std() != 0 else 0
-    
-    # Drawdown calculation
-    peak = portfolio_value.expanding().max()
-    drawdown = (portfolio_value - peak) / peak
-    max_drawdown = drawdown.min()
+    # One fused pass yields every sum/count/drawdown the sections below need
+    stats = ReturnStats.from_returns(returns)
+    pv = portfolio_value.to_numpy(dtype=np.float64)
+    (_, _, total_wins, winning_days,
+     neg_sum, losing_days, non_zero_return_days, max_drawdown) = _fused_stats(stats.r, pv)
+    total_trading_days = len(stats.r)
+    
+    mean_return = stats.mean
+    std_return = stats.std
+    volatility = std_return * np.sqrt(252)
+    sharpe_ratio = (mean_return / std_return) * np.sqrt(252) if std_return != 0 else 0
+    max_drawdown = float(max_drawdown)
     
     # Calmar ratio
     calmar_ratio = annual_return / abs(max_drawdown) if max_drawdown != 0 else 0
     
     # Sortino ratio (downside deviation)
-    downside_returns = returns[returns < 0]
-    downside_std = downside_returns.std() * np.sqrt(252) if len(downside_returns) > 0 else 0
+    downside_returns = stats.r[stats.neg_mask]
+    downside_std = downside_returns.std(ddof=1) * np.sqrt(252) if losing_days > 1 else 0
     sortino_ratio = annual_return / downside_std if downside_std != 0 else 0
     
     metrics['Annual Volatility'] = volatility
@@ -100,21 +240,13 @@ def extract_comprehensive_metrics(results_dir):
     
     # ============= TRADING ACTIVITY METRICS =============
     # Win/Loss analysis
-    positive_returns = returns[returns > 0]
-    negative_returns = returns[returns < 0]
-    
-    winning_days = len(positive_returns)
-    losing_days = len(negative_returns)
-    total_trading_days = len(returns)
-    
     win_rate = (winning_days / total_trading_days) * 100 if total_trading_days > 0 else 0
     
-    avg_win = positive_returns.mean() if len(positive_returns) > 0 else 0
-    avg_loss = negative_returns.mean() if len(negative_returns) > 0 else 0
+    avg_win = total_wins / winning_days if winning_days > 0 else 0
+    avg_loss = neg_sum / losing_days if losing_days > 0 else 0
     
     # Profit factor
-    total_wins = positive_returns.sum() if len(positive_returns) > 0 else 0
-    total_losses = abs(negative_returns.sum()) if len(negative_returns) > 0 else 0
+    total_losses = abs(neg_sum)
     profit_factor = total_wins / total_losses if total_losses != 0 else float('inf')
     
     metrics['Total Trading Days'] = total_trading_days
@@ -129,11 +261,12 @@ def extract_comprehensive_metrics(results_dir):
     
     # ============= EXPOSURE METRICS =============
     # Calculate exposure (time in market)
-    non_zero_return_days = len(returns[returns != 0])
     exposure = (non_zero_return_days / total_trading_days) * 100 if total_trading_days > 0 else 0
     
     metrics['Market Exposure %'] = exposure
     
+    if return_stats:
+        return metrics, stats
     return metrics
 
 def analyze_detailed_transactions(results_dir):
@@ -151,41 +284,31 @@ def analyze_detailed_transactions(results_dir):
             print(f"📈 Found trade book with {len(trade_book)} records")
             
             # Count actual trades (non-empty transaction strings)
-            actual_trades = trade_book[trade_book['transaction_str'] != '[]']
+            actual_trades = trade_book[trade_book['transaction_str'].ne('[]')]
             num_trades = len(actual_trades)
             
             transaction_metrics['Number of Trades'] = num_trades
             transaction_metrics['Average Trades per Day'] = num_trades / len(trade_book) if len(trade_book) > 0 else 0
             
-            # Parse transaction details for more metrics
-            total_transaction_value = 0
-            total_commissions = 0
-            buy_trades = 0
-            sell_trades = 0
-            
-            for _, row in actual_trades.iterrows():
+            # Parse each transaction string once, keeping only dict entries
+            txns = []
+            for txn_str in actual_trades['transaction_str']:
                 try:
-                    # Parse the transaction string (it's a list representation)
-                    import ast
-                    transactions = ast.literal_eval(row['transaction_str'])
-                    
-                    for txn in transactions:
-                        if isinstance(txn, dict):
-                            amount = txn.get('amount', 0)
-                            price = txn.get('price', 0)
-                            commission = txn.get('commission', 0)
-                            
-                            total_transaction_value += abs(amount * price)
-                            if commission:
-                                total_commissions += commission
-                            
-                            if amount > 0:
-                                buy_trades += 1
-                            elif amount < 0:
-                                sell_trades += 1
-                                
-                except Exception as parse_e:
+                    parsed = ast.literal_eval(txn_str)
+                except Exception:
                     continue
+                txns.extend(txn for txn in parsed if isinstance(txn, dict))
+            
+            # Flatten into preallocated arrays (count is known, so no resizing)
+            n_txn = len(txns)
+            amounts = np.fromiter((txn.get('amount', 0) for txn in txns), dtype=np.float64, count=n_txn)
+            prices = np.fromiter((txn.get('price', 0) for txn in txns), dtype=np.float64, count=n_txn)
+            commissions = np.fromiter((txn.get('commission') or 0 for txn in txns), dtype=np.float64, count=n_txn)
+            
+            total_transaction_value = float(np.abs(amounts * prices).sum())
+            total_commissions = float(commissions.sum())
+            buy_trades = int(np.count_nonzero(amounts > 0))
+            sell_trades = int(np.count_nonzero(amounts < 0))
             
             transaction_metrics['Buy Trades'] = buy_trades
             transaction_metrics['Sell Trades'] = sell_trades
@@ -202,7 +325,7 @@ def analyze_detailed_transactions(results_dir):
             print(f"📋 Found order book with {len(order_book)} records")
             
             # Count actual orders (non-empty order strings)
-            actual_orders = order_book[order_book['order_str'] != '[]']
+            actual_orders = order_book[order_book['order_str'].ne('[]')]
             num_orders = len(actual_orders)
             
             transaction_metrics['Number of Orders'] = num_orders
@@ -212,7 +335,6 @@ def analyze_detailed_transactions(results_dir):
             
             for _, row in actual_orders.iterrows():
                 try:
-                    import ast
                     orders = ast.literal_eval(row['order_str'])
                     
                     for order in orders:
@@ -235,29 +357,32 @@ def analyze_detailed_transactions(results_dir):
 def calculate_risk_adjusted_returns(returns, risk_free_rate=0.02):
     """
     Calculate various risk-adjusted return metrics
+
+    Accepts either a returns series or the ReturnStats built by
+    extract_comprehensive_metrics.
     """
+    stats = returns if isinstance(returns, ReturnStats) else ReturnStats.from_returns(returns)
     risk_metrics = {}
     
-    # Convert risk-free rate to daily
-    daily_rf = risk_free_rate / 252
-    
-    # Excess returns
-    excess_returns = returns - daily_rf
-    
     # Information ratio (similar to Sharpe but uses tracking error)
-    tracking_error = returns.std() * np.sqrt(252)
-    information_ratio = (returns.mean() * 252) / tracking_error if tracking_error != 0 else 0
+    tracking_error = stats.std * np.sqrt(252)
+    information_ratio = (stats.mean * 252) / tracking_error if tracking_error != 0 else 0
     
     # Treynor ratio (requires beta, simplified here)
     # Assuming beta = 1 for simplification
     beta = 1.0
-    treynor_ratio = (returns.mean() * 252 - risk_free_rate) / beta
+    treynor_ratio = (stats.mean * 252 - risk_free_rate) / beta
     
     # Value at Risk (VaR) - 95% confidence
-    var_95 = np.percentile(returns, 5)
+    # np.partition selects the 5% order statistic in linear time (no full sort)
+    r = stats.r
+    k = max(1, int(0.05 * r.size)) if r.size > 1 else 0
+    part = np.partition(r, k)
+    var_95 = part[k]
     
     # Conditional Value at Risk (CVaR) - Expected Shortfall
-    cvar_95 = returns[returns <= var_95].mean()
+    # The partitioned prefix already holds every return at or below VaR
+    cvar_95 = part[:k + 1].mean()
     
     risk_metrics['Information Ratio'] = information_ratio
     risk_metrics['Treynor Ratio'] = treynor_ratio
@@ -285,100 +410,30 @@ def main():
     print("=" * 80)
 
     # Extract comprehensive metrics
-    metrics = extract_comprehensive_metrics(results_dir)
-    if metrics is None:
+    extracted = extract_comprehensive_metrics(results_dir, return_stats=True)
+    if extracted is None:
         sys.exit(1)
+    metrics, stats = extracted
 
     # Analyze transactions
     transaction_metrics = analyze_detailed_transactions(results_dir)
 
-    # Calculate risk-adjusted returns
-    basic_results = pd.read_csv(os.path.join(results_dir, 'basic_results.csv'), index_col=0, parse_dates=True)
-    risk_metrics = calculate_risk_adjusted_returns(basic_results['returns'])
+    # Calculate risk-adjusted returns (reuses the returns parsed above)
+    risk_metrics = calculate_risk_adjusted_returns(stats)
 
     # Combine all metrics
     all_metrics = {**metrics, **transaction_metrics, **risk_metrics}
 
-    # Display results
-    print("\n📊 COMPREHENSIVE TRADING METRICS")
-    print("=" * 50)
-
-    # Capital & Returns
-    print("\n💰 CAPITAL & RETURNS:")
-    for key in ['Initial Capital', 'Ending Capital', 'Net Profit', 'Net Profit %',
-                'Total Return %', 'Annualized Return %']:
-        if key in all_metrics:
-            value = all_metrics[key]
-            if isinstance(value, float):
-                if '%' in key:
-                    print(f"   {key:<30}: {value:>12.2f}%")
-                elif 'Capital' in key or 'Profit' in key:
-                    print(f"   {key:<30}: ${value:>12,.2f}")
-                else:
-                    print(f"   {key:<30}: {value:>12.4f}")
-            else:
-                print(f"   {key:<30}: {value:>12}")
-
-    # Risk Metrics
-    print("\n📉 RISK METRICS:")
-    for key in ['Annual Volatility %', 'Sharpe Ratio', 'Max Drawdown %',
-                'Calmar Ratio', 'Sortino Ratio', 'Information Ratio']:
-        if key in all_metrics:
-            value = all_metrics[key]
-            if '%' in key:
-                print(f"   {key:<30}: {value:>12.2f}%")
-            else:
-                print(f"   {key:<30}: {value:>12.4f}")
-
-    # Trading Activity
-    print("\n📈 TRADING ACTIVITY:")
-    for key in ['Total Trading Days', 'Number of Trades', 'Number of Orders',
-                'Buy Trades', 'Sell Trades', 'Filled Orders', 'Order Fill Rate %']:
-        if key in all_metrics:
-            value = all_metrics[key]
-            if isinstance(value, float):
-                if '%' in key:
-                    print(f"   {key:<30}: {value:>12.2f}%")
-                else:
-                    print(f"   {key:<30}: {value:>12.2f}")
-            else:
-                print(f"   {key:<30}: {value:>12}")
-
-    # Transaction Costs & Values
-    print("\n💱 TRANSACTION ANALYSIS:")
-    for key in ['Total Transaction Value', 'Total Transaction Costs',
-                'Average Transaction Cost', 'Winning Days', 'Losing Days', 'Win Rate %']:
-        if key in all_metrics:
-            value = all_metrics[key]
-            if isinstance(value, float):
-                if '%' in key:
-                    print(f"   {key:<30}: {value:>12.2f}%")
-                elif 'Value' in key or 'Cost' in key:
-                    print(f"   {key:<30}: ${value:>12,.2f}")
-                else:
-                    print(f"   {key:<30}: {value:>12.2f}")
-            else:
-                print(f"   {key:<30}: {value:>12}")
-
-    # Performance Analysis
-    print("\n🎯 PERFORMANCE ANALYSIS:")
-    for key in ['Average Win %', 'Average Loss %', 'Profit Factor', 'Market Exposure %']:
-        if key in all_metrics:
-            value = all_metrics[key]
-            if '%' in key:
-                print(f"   {key:<30}: {value:>12.2f}%")
-            else:
-                print(f"   {key:<30}: {value:>12.4f}")
-
-    # Risk Analysis
-    print("\n⚠️  RISK ANALYSIS:")
-    for key in ['Value at Risk (95%) %', 'Conditional VaR (95%) %', 'Treynor Ratio']:
-        if key in all_metrics:
-            value = all_metrics[key]
-            if '%' in key:
-                print(f"   {key:<30}: {value:>12.2f}%")
-            else:
-                print(f"   {key:<30}: {value:>12.4f}")
+    # Display results (report built up front and written with a single print)
+    lines = ["\n📊 COMPREHENSIVE TRADING METRICS", "=" * 50]
+    for title, fields in DISPLAY_SECTIONS:
+        lines.append(f"\n{title}:")
+        lines.extend(
+            f"   {key:<30}: " + fmt.format(all_metrics[key])
+            for key, fmt in fields
+            if all_metrics.get(key) is not None
+        )
+    print("\n".join(lines))
 
     # Save to CSV
     output_file = os.path.join(results_dir, 'comprehensive_trading_metrics.csv')
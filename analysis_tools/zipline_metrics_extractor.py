@@ -13,6 +13,7 @@ Example:
     python zipline_metrics_extractor.py backtest_results/rsi_support_resistance
 """
 
+import ast
 import os
 import sys
 import pandas as pd
@@ -20,6 +21,54 @@ import numpy as np
 import warnings
 warnings.filterwarnings("ignore")
 
+def alpha_beta(strat, bench):
+    """
+    Annualized alpha and beta from one OLS fit of strategy on benchmark returns
+
+    Only days where both returns are finite are used; a flat benchmark gives (0, 0).
+    """
+    s = np.asarray(strat, dtype=float)
+    b = np.asarray(bench, dtype=float)
+    valid = np.isfinite(s) & np.isfinite(b)
+    s, b = s[valid], b[valid]
+    if b.size < 2 or np.var(b) == 0:
+        return 0, 0
+    A = np.column_stack([np.ones_like(b), b])
+    (alpha_daily, beta), *_ = np.linalg.lstsq(A, s, rcond=None)
+    return alpha_daily * 252, beta
+
+def _drawdown(pv):
+    """Drawdown series pv / running peak - 1 (float64), using a single output array"""
+    pv = np.asarray(pv, dtype=np.float64)
+    drawdown = np.maximum.accumulate(pv)
+    np.divide(pv, drawdown, out=drawdown)
+    drawdown -= 1
+    return drawdown
+
+
+def load_basic_results(results_dir, columns=('returns', 'portfolio_value', 'benchmark_period_return')):
+    """
+    Load the per-day return series, preferring the runner's basic_results.feather sidecar
+
+    The sidecar is memory-mapped and only the requested columns are read; falls back to
+    basic_results.csv (or returns None if neither exists).
+    """
+    feather_path = os.path.join(results_dir, 'basic_results.feather')
+    if os.path.exists(feather_path):
+        try:
+            from pyarrow import feather
+            table = feather.read_table(feather_path, memory_map=True)
+            table = table.select(['date'] + [col for col in columns if col in table.column_names])
+            return table.to_pandas(split_blocks=True).set_index('date')
+        except ImportError:
+            pass
+
+    csv_path = os.path.join(results_dir, 'basic_results.csv')
+    if os.path.exists(csv_path):
+        return pd.read_csv(csv_path, index_col=0, parse_dates=True)
+    return None
+
+
 def extract_all_available_metrics(results_dir):
     """
     Extract ALL available metrics from Zipline backtest results
@@ -29,69 +78,78 @@ def extract_all_available_metrics(results_dir):
     all_metrics = {}
     
     # 1. BASIC RESULTS ANALYSIS
-    basic_results_path = os.path.join(results_dir, 'basic_results.csv')
-    if os.path.exists(basic_results_path):
-        print("📊 Analyzing basic_results.csv...")
-        basic_results = pd.read_csv(basic_results_path, index_col=0, parse_dates=True)
+    basic_results = load_basic_results(results_dir)
+    if basic_results is not None:
+        print("📊 Analyzing basic results...")
         
-        # Portfolio metrics
-        portfolio_value = basic_results['portfolio_value']
-        returns = basic_results['returns']
+        # Convert once; every metric below is a NumPy reduction on these arrays
+        # (nan-aware where pandas would have skipped NaNs)
+        pv = basic_results['portfolio_value'].to_numpy(dtype=float)
+        r = basic_results['returns'].to_numpy(dtype=float)
         
+        # Portfolio metrics
+        total_return_pct = ((pv[-1] / pv[0]) - 1) * 100
         all_metrics.update({
-            'Initial Capital': portfolio_value.iloc[0],
-            'Ending Capital': portfolio_value.iloc[-1],
-            'Net Profit': portfolio_value.iloc[-1] - portfolio_value.iloc[0],
-            'Net Profit %': ((portfolio_value.iloc[-1] / portfolio_value.iloc[0]) - 1) * 100,
-            'Total Return %': ((portfolio_value.iloc[-1] / portfolio_value.iloc[0]) - 1) * 100,
+            'Initial Capital': pv[0],
+            'Ending Capital': pv[-1],
+            'Net Profit': pv[-1] - pv[0],
+            'Net Profit %': total_return_pct,
+            'Total Return %': total_return_pct,
             'Total Trading Days': len(basic_results),
-            'Peak Portfolio Value': portfolio_value.max(),
-            'Lowest Portfolio Value': portfolio_value.min(),
+            'Peak Portfolio Value': np.nanmax(pv),
+            'Lowest Portfolio Value': np.nanmin(pv),
         })
         
-        # Return analysis
+        # Return analysis (counts via np.count_nonzero on the raw array, no filtered Series)
+        positive_days = int(np.count_nonzero(r > 0))
+        mean_ret = np.nanmean(r)
+        std_ret = np.nanstd(r, ddof=1)  # Same sample std as Series.std(); reused by the risk metrics below
         all_metrics.update({
-            'Best Day Return %': returns.max() * 100,
-            'Worst Day Return %': returns.min() * 100,
-            'Average Daily Return %': returns.mean() * 100,
-            'Median Daily Return %': returns.median() * 100,
-            'Daily Return Std Dev %': returns.std() * 100,
-            'Positive Return Days': (returns > 0).sum(),
-            'Negative Return Days': (returns < 0).sum(),
-            'Zero Return Days': (returns == 0).sum(),
-            'Win Rate %': ((returns > 0).sum() / len(returns)) * 100,
+            'Best Day Return %': np.nanmax(r) * 100,
+            'Worst Day Return %': np.nanmin(r) * 100,
+            'Average Daily Return %': mean_ret * 100,
+            'Median Daily Return %': np.nanmedian(r) * 100,
+            'Daily Return Std Dev %': std_ret * 100,
+            'Positive Return Days': positive_days,
+            'Negative Return Days': int(np.count_nonzero(r < 0)),
+            'Zero Return Days': int(np.count_nonzero(r == 0)),
+            'Win Rate %': (positive_days / len(r)) * 100,
         })
         
         # Risk metrics
-        annual_return = (1 + returns.mean()) ** 252 - 1
-        annual_vol = returns.std() * np.sqrt(252)
-        sharpe = (returns.mean() / returns.std()) * np.sqrt(252) if returns.std() != 0 else 0
+        annual_return = (1 + mean_ret) ** 252 - 1
+        annual_vol = std_ret * np.sqrt(252)
+        sharpe = (mean_ret / std_ret) * np.sqrt(252) if std_ret != 0 else 0
         
-        # Drawdown analysis
-        peak = portfolio_value.expanding().max()
-        drawdown = (portfolio_value - peak) / peak
+        # Drawdown analysis (one in-place running-peak pass; every drawdown metric reuses the same array)
+        drawdown = _drawdown(pv)
+        underwater = drawdown < 0
+        underwater_days = int(np.count_nonzero(underwater))
         
         all_metrics.update({
             'Annualized Return %': annual_return * 100,
             'Annualized Volatility %': annual_vol * 100,
             'Sharpe Ratio': sharpe,
-            'Max Drawdown %': drawdown.min() * 100,
-            'Current Drawdown %': drawdown.iloc[-1] * 100,
-            'Average Drawdown %': drawdown[drawdown < 0].mean() * 100 if (drawdown < 0).any() else 0,
-            'Drawdown Duration (days)': len(drawdown[drawdown < 0]),
+            'Max Drawdown %': float(drawdown.min()) * 100,
+            'Current Drawdown %': float(drawdown[-1]) * 100,
+            'Average Drawdown %': float(drawdown[underwater].mean()) * 100 if underwater_days else 0,
+            'Drawdown Duration (days)': underwater_days,
         })
         
         # Benchmark analysis (if available)
         if 'benchmark_period_return' in basic_results.columns:
-            benchmark_returns = basic_results['benchmark_period_return']
-            excess_returns = returns - benchmark_returns
+            benchmark_returns = basic_results['benchmark_period_return'].to_numpy(dtype=float)
+            excess_returns = r - benchmark_returns
+            excess_mean = np.nanmean(excess_returns)
+            excess_std = np.nanstd(excess_returns, ddof=1)
+            _, beta = alpha_beta(r, benchmark_returns)
             
             all_metrics.update({
-                'Benchmark Total Return %': ((1 + benchmark_returns).prod() - 1) * 100,
-                'Excess Return %': excess_returns.mean() * 252 * 100,
-                'Tracking Error %': excess_returns.std() * np.sqrt(252) * 100,
-                'Information Ratio': (excess_returns.mean() / excess_returns.std()) * np.sqrt(252) if excess_returns.std() != 0 else 0,
-                'Beta': np.cov(returns, benchmark_returns)[0,1] / np.var(benchmark_returns) if np.var(benchmark_returns) != 0 else 0,
+                'Benchmark Total Return %': (np.nanprod(1 + benchmark_returns) - 1) * 100,
+                'Excess Return %': excess_mean * 252 * 100,
+                'Tracking Error %': excess_std * np.sqrt(252) * 100,
+                'Information Ratio': (excess_mean / excess_std) * np.sqrt(252) if excess_std != 0 else 0,
+                'Beta': beta,
             })
     
     # 2. PERFORMANCE STATISTICS ANALYSIS
@@ -100,9 +158,8 @@ def extract_all_available_metrics(results_dir):
         print("📈 Analyzing performance_statistics.csv...")
         perf_stats = pd.read_csv(perf_stats_path, index_col=0)
         
-        # Add all Pyfolio metrics
-        for metric_name in perf_stats.index:
-            value = perf_stats.loc[metric_name].iloc[0]
+        # Add all Pyfolio metrics (one dict conversion instead of a .loc lookup per metric)
+        for metric_name, value in perf_stats.iloc[:, 0].to_dict().items():
             all_metrics[f'Pyfolio {metric_name}'] = value
     
     # 3. TRADE BOOK ANALYSIS
@@ -129,7 +186,6 @@ def extract_all_available_metrics(results_dir):
         
         for _, row in actual_trades.iterrows():
             try:
-                import ast
                 transactions = ast.literal_eval(row['transaction_str'])
                 
                 for txn in transactions:
@@ -178,7 +234,6 @@ def extract_all_available_metrics(results_dir):
         
         for _, row in actual_orders.iterrows():
             try:
-                import ast
                 orders = ast.literal_eval(row['order_str'])
                 
                 for order in orders:
@@ -204,8 +259,7 @@ def extract_all_available_metrics(results_dir):
         print("📊 Analyzing benchmark_metrics.csv...")
         benchmark_metrics = pd.read_csv(benchmark_path, index_col=0)
         
-        for metric_name in benchmark_metrics.index:
-            value = benchmark_metrics.loc[metric_name].iloc[0]
+        for metric_name, value in benchmark_metrics.iloc[:, 0].to_dict().items():
             all_metrics[f'Benchmark {metric_name}'] = value
     
     return all_metrics
@@ -214,95 +268,98 @@ def display_metrics_by_category(all_metrics):
     """
     Display metrics organized by category
     """
-    print("\n" + "=" * 80)
-    print("📊 ALL AVAILABLE ZIPLINE RELOADED METRICS")
-    print("=" * 80)
+    lines = []  # Collected and printed once at the end instead of one print per metric
+    lines.append("\n" + "=" * 80)
+    lines.append("📊 ALL AVAILABLE ZIPLINE RELOADED METRICS")
+    lines.append("=" * 80)
     
     # Capital & Portfolio Metrics
     capital_metrics = [k for k in all_metrics.keys() if any(word in k for word in ['Capital', 'Profit', 'Portfolio', 'Value'])]
     if capital_metrics:
-        print("\n💰 CAPITAL & PORTFOLIO METRICS:")
+        lines.append("\n💰 CAPITAL & PORTFOLIO METRICS:")
         for key in sorted(capital_metrics):
             value = all_metrics[key]
             if isinstance(value, (int, float)):
                 if '%' in key:
-                    print(f"   {key:<40}: {value:>15.2f}%")
+                    lines.append(f"   {key:<40}: {value:>15.2f}%")
                 elif any(word in key for word in ['Capital', 'Profit', 'Value', 'Volume', 'Cost']):
-                    print(f"   {key:<40}: ${value:>15,.2f}")
+                    lines.append(f"   {key:<40}: ${value:>15,.2f}")
                 else:
-                    print(f"   {key:<40}: {value:>15.2f}")
+                    lines.append(f"   {key:<40}: {value:>15.2f}")
             else:
-                print(f"   {key:<40}: {value:>15}")
+                lines.append(f"   {key:<40}: {value:>15}")
     
     # Return Metrics
     return_metrics = [k for k in all_metrics.keys() if 'Return' in k and k not in capital_metrics]
     if return_metrics:
-        print("\n📈 RETURN METRICS:")
+        lines.append("\n📈 RETURN METRICS:")
         for key in sorted(return_metrics):
             value = all_metrics[key]
             if isinstance(value, (int, float)):
                 if '%' in key:
-                    print(f"   {key:<40}: {value:>15.2f}%")
+                    lines.append(f"   {key:<40}: {value:>15.2f}%")
                 else:
-                    print(f"   {key:<40}: {value:>15.4f}")
+                    lines.append(f"   {key:<40}: {value:>15.4f}")
             else:
-                print(f"   {key:<40}: {value:>15}")
+                lines.append(f"   {key:<40}: {value:>15}")
     
     # Risk Metrics
     risk_metrics = [k for k in all_metrics.keys() if any(word in k for word in ['Risk', 'Volatility', 'Sharpe', 'Drawdown', 'VaR', 'Ratio'])]
     if risk_metrics:
-        print("\n📉 RISK METRICS:")
+        lines.append("\n📉 RISK METRICS:")
         for key in sorted(risk_metrics):
             value = all_metrics[key]
             if isinstance(value, (int, float)):
                 if '%' in key:
-                    print(f"   {key:<40}: {value:>15.2f}%")
+                    lines.append(f"   {key:<40}: {value:>15.2f}%")
                 else:
-                    print(f"   {key:<40}: {value:>15.4f}")
+                    lines.append(f"   {key:<40}: {value:>15.4f}")
             else:
-                print(f"   {key:<40}: {value:>15}")
+                lines.append(f"   {key:<40}: {value:>15}")
     
     # Trading Activity Metrics
     trading_metrics = [k for k in all_metrics.keys() if any(word in k for word in ['Trade', 'Order', 'Transaction', 'Days', 'Frequency'])]
     if trading_metrics:
-        print("\n📊 TRADING ACTIVITY METRICS:")
+        lines.append("\n📊 TRADING ACTIVITY METRICS:")
         for key in sorted(trading_metrics):
             value = all_metrics[key]
             if isinstance(value, (int, float)):
                 if '%' in key:
-                    print(f"   {key:<40}: {value:>15.2f}%")
+                    lines.append(f"   {key:<40}: {value:>15.2f}%")
                 else:
-                    print(f"   {key:<40}: {value:>15.0f}")
+                    lines.append(f"   {key:<40}: {value:>15.0f}")
             else:
-                print(f"   {key:<40}: {value:>15}")
+                lines.append(f"   {key:<40}: {value:>15}")
     
     # Benchmark Metrics
     benchmark_metrics = [k for k in all_metrics.keys() if 'Benchmark' in k or any(word in k for word in ['Beta', 'Alpha', 'Excess', 'Tracking'])]
     if benchmark_metrics:
-        print("\n🎯 BENCHMARK COMPARISON METRICS:")
+        lines.append("\n🎯 BENCHMARK COMPARISON METRICS:")
         for key in sorted(benchmark_metrics):
             value = all_metrics[key]
             if isinstance(value, (int, float)):
                 if '%' in key:
-                    print(f"   {key:<40}: {value:>15.2f}%")
+                    lines.append(f"   {key:<40}: {value:>15.2f}%")
                 else:
-                    print(f"   {key:<40}: {value:>15.4f}")
+                    lines.append(f"   {key:<40}: {value:>15.4f}")
             else:
-                print(f"   {key:<40}: {value:>15}")
+                lines.append(f"   {key:<40}: {value:>15}")
     
     # Pyfolio Metrics
     pyfolio_metrics = [k for k in all_metrics.keys() if 'Pyfolio' in k]
     if pyfolio_metrics:
-        print("\n🔬 PYFOLIO ADVANCED METRICS:")
+        lines.append("\n🔬 PYFOLIO ADVANCED METRICS:")
         for key in sorted(pyfolio_metrics):
             value = all_metrics[key]
             if isinstance(value, (int, float)):
                 if any(word in key.lower() for word in ['return', 'volatility', 'drawdown']):
-                    print(f"   {key:<40}: {value:>15.2%}")
+                    lines.append(f"   {key:<40}: {value:>15.2%}")
                 else:
-                    print(f"   {key:<40}: {value:>15.4f}")
+                    lines.append(f"   {key:<40}: {value:>15.4f}")
             else:
-                print(f"   {key:<40}: {value:>15}")
+                lines.append(f"   {key:<40}: {value:>15}")
+
+    print("\n".join(lines))
 
 def main():
     if len(sys.argv) != 2:
@@ -334,7 +391,7 @@ def main():
     print(f"\n✅ ALL {len(all_metrics)} metrics saved to: {output_file}")
     print(f"\n📋 SUMMARY:")
     print(f"   Total metrics extracted: {len(all_metrics)}")
-    print(f"   Files analyzed: {len([f for f in ['basic_results.csv', 'performance_statistics.csv', 'trade_book.csv', 'order_book.csv', 'benchmark_metrics.csv'] if os.path.exists(os.path.join(results_dir, f))])}")
+    print(f"   Files analyzed: {len([f for f in ['basic_results.feather', 'basic_results.csv', 'performance_statistics.csv', 'trade_book.csv', 'order_book.csv', 'benchmark_metrics.csv'] if os.path.exists(os.path.join(results_dir, f))])}")
     print("\n" + "=" * 80)
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+"""
+Single-pass performance summary for a daily return series.
+
+summarize(r) walks the returns once, tracking sum, sum of squares, the compounded
+equity curve, its running peak and the positive-day count, instead of one NumPy
+reduction (and temporary) per metric. NaN returns are skipped, matching the
+nan-aware reductions used elsewhere. Numba is optional; without it a NumPy
+version computes the same values.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+TRADING_DAYS = 252
+
+
+def _finish(n, s, s2, cum, dd_min, pos):
+    """Turn the running sums into the summary tuple."""
+    if n == 0:
+        return 0.0, 0.0, 0.0, 0.0, 0.0, 0.0
+    mean = s / n
+    var = (s2 - n * mean * mean) / (n - 1) if n > 1 else 0.0
+    std = np.sqrt(var) if var > 0 else 0.0
+    total_ret = cum - 1.0
+    ann_ret = (1.0 + mean) ** TRADING_DAYS - 1.0
+    vol = std * np.sqrt(TRADING_DAYS)
+    sharpe = mean / std * np.sqrt(TRADING_DAYS) if std > 0 else 0.0
+    return total_ret, ann_ret, vol, sharpe, dd_min, pos / n
+
+
+def _summarize_numpy(r):
+    """NumPy fallback for _summarize (one temporary per reduction)."""
+    r = r[~np.isnan(r)]
+    if not r.size:
+        return _finish(0, 0.0, 0.0, 1.0, 0.0, 0)
+    equity = np.cumprod(1.0 + r)
+    peak = np.maximum(np.maximum.accumulate(equity), 1.0)
+    dd_min = min(float((equity / peak - 1.0).min()), 0.0)
+    return _finish(r.size, r.sum(), (r * r).sum(), equity[-1], dd_min, int(np.count_nonzero(r > 0)))
+
+
+def _summarize_loop(r):
+    n = 0
+    s = 0.0
+    s2 = 0.0
+    cum = 1.0
+    cum_max = 1.0
+    dd_min = 0.0
+    pos = 0
+    for i in range(r.shape[0]):
+        x = r[i]
+        if np.isnan(x):
+            continue
+        n += 1
+        s += x
+        s2 += x * x
+        if x > 0:
+            pos += 1
+        cum *= 1.0 + x
+        if cum > cum_max:
+            cum_max = cum
+        dd = cum / cum_max - 1.0
+        if dd < dd_min:
+            dd_min = dd
+    return _finish(n, s, s2, cum, dd_min, pos)
+
+
+if NUMBA_AVAILABLE:
+    # fastmath without 'nnan' so the NaN skip is not optimized away
+    _finish = njit(cache=True)(_finish)
+    _summarize = njit(cache=True, fastmath={'reassoc', 'contract', 'arcp'})(_summarize_loop)
+    _summarize(np.zeros(2))  # Pay the compile (or cache load) cost at import
+else:
+    _summarize = _summarize_numpy
+
+
+def summarize(returns):
+    """
+    (total return, annualized return, annualized volatility, Sharpe, max drawdown, win rate)
+
+    All values are fractions; max drawdown is <= 0 and taken from the compounded returns.
+    """
+    r = np.ascontiguousarray(np.asarray(returns, dtype=np.float64))
+    return tuple(float(v) for v in _summarize(r))
@@ -0,0 +1,118 @@
+"""
+Cached CVXPY risk-parity problem shared by the Riskfolio strategies.
+
+Riskfolio rebuilds and re-canonicalizes its CVXPY problem on every rp_optimization
+call; for the small, stable NSE universes that setup dominates the solve. The
+problem here is built once per universe size with cp.Parameter inputs and
+re-solved with warm_start. CVXPY (a riskfolio-lib dependency) is optional;
+callers check CVXPY_AVAILABLE and fall back to Riskfolio without it.
+
+Before touching CVXPY, RiskParityProblem.solve tries erc_weights, a cyclical
+coordinate descent for the unconstrained equal-risk-contribution portfolio. When
+that portfolio already meets the minimum-return constraint it is the optimum of
+the full problem, and the conic solve is skipped.
+"""
+
+import numpy as np
+
+try:
+    import cvxpy as cp
+    CVXPY_AVAILABLE = True
+except ImportError:
+    CVXPY_AVAILABLE = False
+
+# Numba is optional: erc_weights runs as plain Python/NumPy without it
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _erc_ccd(cov, tol, max_iter):
+    """
+    Cyclical coordinate descent on 0.5 y' cov y - b' log(y) with b = 1/N
+    (Griveau-Billion, Richard & Roncalli, 2013); returns (weights summing to 1, converged)
+    """
+    n = cov.shape[0]
+    b = 1.0 / n
+    y = 1.0 / np.sqrt(np.diag(cov).copy())
+    y *= 1.0 / y.sum()
+    for _ in range(max_iter):
+        max_step = 0.0
+        for i in range(n):
+            # Root of cov_ii y_i^2 + c y_i - b = 0 with c the off-diagonal part of (cov y)_i
+            c = np.dot(cov[i], y) - cov[i, i] * y[i]
+            y_new = (-c + np.sqrt(c * c + 4.0 * cov[i, i] * b)) / (2.0 * cov[i, i])
+            step = abs(y_new - y[i]) / y_new
+            if step > max_step:
+                max_step = step
+            y[i] = y_new
+        if max_step < tol:
+            return y / y.sum(), True
+    return y / y.sum(), False
+
+
+if NUMBA_AVAILABLE:
+    _erc_ccd = njit(cache=True)(_erc_ccd)
+    _erc_ccd(np.eye(2), 1e-10, 10)  # Pay the compile (or cache load) cost at import
+
+
+def erc_weights(cov, tol=1e-10, max_iter=1000):
+    """Equal-risk-contribution weights for a covariance matrix, or None if the iteration did not converge"""
+    cov = np.ascontiguousarray(cov, dtype=np.float64)
+    if not np.all(np.diag(cov) > 0):
+        return None
+    w, converged = _erc_ccd(cov, tol, max_iter)
+    return w if converged else None
+
+
+class RiskParityProblem:
+    """Equal-risk-contribution problem for a fixed number of assets, built once and re-solved with new data.
+
+    Same formulation as riskfolio's rp_optimization(model='Classic', rm='MV'): minimise portfolio
+    variance subject to b' log(w) >= 1 (b = 1/N) and the minimum-return constraint, then rescale w
+    to sum to 1. mu, the covariance factor and lowerret are cp.Parameters, so later solves skip
+    canonicalization and warm-start from the previous solution.
+    """
+
+    def __init__(self, n_assets):
+        self.w = cp.Variable(n_assets)
+        self.factor = cp.Parameter((n_assets, n_assets))
+        self.mu = cp.Parameter(n_assets)
+        self.lowerret = cp.Parameter()
+        budget = np.full(n_assets, 1.0 / n_assets)
+        self.problem = cp.Problem(
+            cp.Minimize(cp.sum_squares(self.factor @ self.w)),
+            [budget @ cp.log(self.w) >= 1, self.mu @ self.w >= self.lowerret * cp.sum(self.w)]
+        )
+        self._last = None  # (mu, cov, lowerret, weights) of the previous solve
+
+    def solve(self, mu, cov, lowerret):
+        """Risk-parity weights summing to 1, or None if the solve fails"""
+        # Same inputs as last time (e.g. an unchanged window): reuse the answer
+        if self._last is not None:
+            last_mu, last_cov, last_lowerret, last_w = self._last
+            if lowerret == last_lowerret and np.array_equal(mu, last_mu) and np.array_equal(cov, last_cov):
+                return last_w.copy()
+
+        # Unconstrained ERC portfolio; if it meets the return floor the constraint is inactive
+        w = erc_weights(cov)
+        if w is None or np.dot(mu, w) < lowerret:
+            w = self._solve_conic(mu, cov, lowerret)
+            if w is None:
+                return None
+        self._last = (np.array(mu, copy=True), np.array(cov, copy=True), lowerret, w)
+        return w.copy()
+
+    def _solve_conic(self, mu, cov, lowerret):
+        """The full problem through CVXPY, warm-started from the previous solve"""
+        # w' cov w == ||L' w||^2 with cov = L L'
+        self.factor.value = np.linalg.cholesky(cov).T
+        self.mu.value = mu
+        self.lowerret.value = lowerret
+        self.problem.solve(warm_start=True)
+        if self.problem.status not in ('optimal', 'optimal_inaccurate') or self.w.value is None:
+            return None
+        w = np.maximum(self.w.value, 0.0)
+        return w / w.sum()
@@ -1,9 +1,11 @@
 import os
+import functools
+import numpy as np
 import pandas as pd
-import pyfolio as pf
-import alphalens as al
 from zipline import run_algorithm
 from zipline.api import set_benchmark, symbol
+from zipline.errors import SymbolNotFound, NoDataOnDate, NoDataBeforeDate, NoDataAfterDate
+from zipline.data import bundles as zipline_bundles
 from zipline.utils.calendar_utils import get_calendar
 import matplotlib
 matplotlib.use('Agg')  # Ensure headless backend so figures render when no display
@@ -13,6 +15,7 @@ import time
 from datetime import datetime
 import warnings
 import pickle
+import shutil
 
 # Configure logging
 logging.basicConfig(
@@ -31,6 +34,112 @@ logger = logging.getLogger(__name__)
 warnings.filterwarnings('ignore', category=FutureWarning)
 warnings.filterwarnings('ignore', category=UserWarning)
 
+@functools.lru_cache(maxsize=4)
+def _load_bundle(bundle):
+    """Open a bundle's readers/asset finder once per process."""
+    return zipline_bundles.load(bundle)
+
+
+# Errors that mean "no usable daily benchmark in this bundle"; the runner then falls back
+# to set_benchmark(symbol(...)). ValueError covers incomplete closes and out-of-calendar dates.
+_BENCHMARK_LOAD_ERRORS = (SymbolNotFound, NoDataOnDate, NoDataBeforeDate, NoDataAfterDate, ValueError)
+
+
+@functools.lru_cache(maxsize=32)
+def _load_benchmark(bundle, benchmark_symbol, start, end):
+    """Load daily benchmark returns from a bundle once per (bundle, symbol, start, end).
+
+    One extra session before start is read so the first return is measured from the
+    prior close. Raises ValueError if any close in the span is missing (e.g. a
+    minute-only bundle with no daily bars) rather than reporting flat 0% days.
+    The cached Series is shared between runners, so callers must not mutate it.
+    """
+    bundle_data = _load_bundle(bundle)
+    asset = bundle_data.asset_finder.lookup_symbol(benchmark_symbol, as_of_date=None)
+    calendar = get_calendar('XBOM')
+    sessions = calendar.sessions_in_range(start, end)
+    first = calendar.previous_session(sessions[0])
+    closes = bundle_data.equity_daily_bar_reader.load_raw_arrays(
+        ['close'], first, sessions[-1], [asset.sid]
+    )[0][:, 0]
+    missing = ~(np.isfinite(closes) & (closes > 0))
+    if missing.any():
+        raise ValueError(f"{np.count_nonzero(missing)} missing daily closes for {benchmark_symbol}")
+    prices = pd.Series(closes, index=sessions.insert(0, first), name=benchmark_symbol)
+    return prices.pct_change().iloc[1:]
+
+
+def write_csv(frame, path):
+    """Write a results/analysis frame (index as the first column) to CSV.
+
+    Formats and writes with pyarrow's native CSV writer when available, which is much faster
+    than DataFrame.to_csv on long minute-level frames; falls back to to_csv otherwise.
+    Asset objects in column labels / object columns are written as their string form.
+    """
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame()
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        frame.to_csv(path)
+        return
+    table = frame.rename(columns=str).reset_index()
+    object_cols = table.columns[table.dtypes == object]
+    if len(object_cols):
+        table = table.astype({col: str for col in object_cols})
+    pa_csv.write_csv(pa.Table.from_pandas(table, preserve_index=False), path)
+
+
+def write_parquet(frame, path):
+    """Write a zstd-compressed Parquet copy of a results/analysis frame for fast programmatic reloads.
+
+    Asset objects in column labels / object columns are stored as their string form.
+    Returns False if no Parquet engine is installed so callers can fall back to CSV.
+    """
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame()
+    frame = frame.rename(columns=str)
+    object_cols = frame.columns[frame.dtypes == object]
+    if len(object_cols):
+        frame = frame.astype({col: str for col in object_cols})
+    try:
+        frame.to_parquet(path, compression='zstd')
+    except ImportError:
+        return False
+    return True
+
+
+BASIC_RESULTS_COLUMNS = ['returns', 'portfolio_value', 'benchmark_period_return']
+
+
+def write_basic_results(perf, output_dir):
+    """Write the float columns the analysis tools read as an uncompressed Feather sidecar.
+
+    The full perf frame carries per-bar positions/transactions/orders object columns; the
+    metric scripts only need these series, and an uncompressed Feather file can be
+    memory-mapped back without materializing the rest. Returns False without pyarrow.
+    """
+    columns = [col for col in BASIC_RESULTS_COLUMNS if col in perf.columns]
+    frame = perf[columns].astype('float64')
+    frame.index = pd.DatetimeIndex(frame.index, name='date')
+    try:
+        frame.reset_index().to_feather(
+            os.path.join(output_dir, 'basic_results.feather'), compression='uncompressed'
+        )
+    except ImportError:
+        return False
+    return True
+
+
+def _rasterize_dense_artists(fig, min_points=5000):
+    """Rasterize long line series (e.g. minute-bar equity curves) so saving doesn't stroke every vertex as vector data."""
+    for ax in fig.axes:
+        for line in ax.get_lines():
+            if len(line.get_xdata()) > min_points:
+                line.set_rasterized(True)
+
+
 class EnhancedZiplineRunner:
     def __init__(self, strategy, bundle='quantopian-quandl', start_date='2015-1-1', end_date='2018-1-1', capital_base=100000, benchmark_symbol='NIFTY', data_frequency='minute', live_start_date=None):
         """
@@ -70,6 +179,7 @@ class EnhancedZiplineRunner:
         
         self.capital_base = capital_base
         self.results = None
+        self.analysis_objects = None  # In-memory returns/positions/transactions from analyze()
         self.benchmark_symbol = benchmark_symbol
         self.data_frequency = data_frequency
         self.live_start_date = live_start_date
@@ -114,9 +224,22 @@ class EnhancedZiplineRunner:
             # Log strategy configuration
             logger.info(f"🎯 Initializing strategy: {self.strategy.__class__.__name__}")
 
+            # Benchmark returns are cached across runners sharing the same bundle/symbol/period
+            benchmark_returns = None
+            if self.benchmark_symbol:
+                try:
+                    benchmark_returns = _load_benchmark(
+                        self.bundle, self.benchmark_symbol, self.start_date, self.end_date
+                    )
+                    logger.info(f"📊 Benchmark returns loaded: {self.benchmark_symbol} "
+                                f"(cache hits: {_load_benchmark.cache_info().hits})")
+                except _BENCHMARK_LOAD_ERRORS as e:
+                    logger.warning(f"⚠️  Could not preload benchmark {self.benchmark_symbol}, "
+                                   f"using set_benchmark instead: {e}")
+
             def initialize_wrapper(context):
                 logger.info("📋 Setting up trading context...")
-                if self.benchmark_symbol:
+                if self.benchmark_symbol and benchmark_returns is None:
                     logger.info(f"📊 Setting benchmark: {self.benchmark_symbol}")
                     set_benchmark(symbol(self.benchmark_symbol))
 
@@ -183,6 +306,7 @@ class EnhancedZiplineRunner:
                 capital_base=self.capital_base,
                 data_frequency=self.data_frequency,
                 bundle=self.bundle,
+                benchmark_returns=benchmark_returns,
                 trading_calendar=get_calendar('XBOM'),
             )
 
@@ -234,8 +358,12 @@ class EnhancedZiplineRunner:
         logger.info("📊 STARTING PERFORMANCE ANALYSIS (robust mode)...")
         logger.info("-" * 40)
         try:
-            # Check if any trades occurred
-            if 'transactions' not in perf.columns or perf['transactions'].apply(len).sum() == 0:
+            # Slim float64 sidecar for the metric scripts, written whether or not any trades happened
+            if write_basic_results(perf, self.output_dir):
+                logger.info("💾 Saved basic_results.feather (returns/portfolio_value).")
+
+            # Check if any trades occurred (any() stops at the first non-empty day)
+            if 'transactions' not in perf.columns or not any(len(txns) for txns in perf['transactions']):
                 logger.info("⚠️  No trades detected - skipping PyFolio analysis")
                 logger.info("💾 Saving performance data only...")
                 
@@ -260,6 +388,8 @@ class EnhancedZiplineRunner:
                 return
             
             # Normal PyFolio analysis for strategies with trades
+            # (pyfolio is imported here: it pulls in empyrical/seaborn/scipy and no other path needs it)
+            import pyfolio as pf
             returns, positions, transactions = pf.utils.extract_rets_pos_txn_from_zipline(perf)
 
             # Normalize index: make tz-naive (pyfolio expects naive)
@@ -273,11 +403,23 @@ class EnhancedZiplineRunner:
                 returns.index = pd.DatetimeIndex(returns.index)
 
             # Save raw artifacts
-            returns.to_csv(os.path.join(self.output_dir, 'returns.csv'))
-            positions.to_csv(os.path.join(self.output_dir, 'positions.csv'))
-            transactions.to_csv(os.path.join(self.output_dir, 'transactions.csv'))
+            write_csv(returns, os.path.join(self.output_dir, 'returns.csv'))
+            write_csv(positions, os.path.join(self.output_dir, 'positions.csv'))
+            write_csv(transactions, os.path.join(self.output_dir, 'transactions.csv'))
             logger.info("💾 Saved returns/positions/transactions.")
 
+            # Binary columnar copies for programmatic reloads (no float -> text -> float round trip)
+            if all(
+                write_parquet(frame, os.path.join(self.output_dir, f'{name}.parquet'))
+                for name, frame in (('returns', returns), ('positions', positions), ('transactions', transactions))
+            ):
+                logger.info("💾 Saved Parquet copies of returns/positions/transactions.")
+            else:
+                logger.warning("⚠️  No Parquet engine available - CSV artifacts only")
+
+            # Keep the frames on the runner so callers need not re-read the CSVs
+            self.analysis_objects = {'returns': returns, 'positions': positions, 'transactions': transactions}
+
             # Generate tear sheet WITHOUT live_start_date
             logger.info("📈 Generating PyFolio full tear sheet...")
             pf.create_full_tear_sheet(
@@ -295,14 +437,15 @@ class EnhancedZiplineRunner:
                 saved_paths = []
                 for i, fnum in enumerate(fig_nums, start=1):
                     fig = plt.figure(fnum)
+                    _rasterize_dense_artists(fig)
                     png_path = os.path.join(figures_dir, f'tear_sheet_{i:02d}.png')
                     fig.savefig(png_path, bbox_inches='tight', dpi=180)
                     saved_paths.append(png_path)
                     logger.info(f"🖼️  Saved figure {i}/{len(fig_nums)} -> {png_path}")
 
-                # Primary summary alias
+                # Primary summary alias (a copy of the first PNG, not a second render)
                 main_path = os.path.join(self.output_dir, 'full_tear_sheet.png')
-                plt.figure(fig_nums[0]).savefig(main_path, bbox_inches='tight', dpi=180)
+                shutil.copyfile(saved_paths[0], main_path)
                 logger.info(f"🖼️  Saved primary tear sheet alias -> {main_path}")
 
                 # Multi-page PDF
@@ -323,9 +466,13 @@ class EnhancedZiplineRunner:
             else:
                 logger.warning("⚠️ No figures produced by pyfolio.")
 
-            # Cache objects
+            # Cache objects (protocol 5 pickles the frames' NumPy blocks without extra copies)
             with open(os.path.join(self.output_dir, 'analysis_objects.pkl'), 'wb') as fh:
-                pickle.dump({'returns': returns, 'positions': positions, 'transactions': transactions}, fh)
+                pickle.dump(
+                    self.analysis_objects,
+                    fh,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
 
             plt.close('all')
             logger.info("✅ ANALYSIS COMPLETED SUCCESSFULLY (robust mode)")
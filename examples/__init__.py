@@ -0,0 +1 @@
+"""Runnable examples; invoke from the repository root as ``python -m examples.<name>``."""
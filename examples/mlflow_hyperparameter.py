@@ -3,11 +3,11 @@
 Features:
 - Parameterized short/long window lengths
 - Uses EnhancedZiplineRunner (PyFolio artifacts auto-generated in analyze())
-- Logs params, metrics, and artifacts (returns/positions/transactions + tear sheets) to MLflow
-- Supports simple hyperparameter grid search inside the script
+- Logs params and metrics for every run to MLflow, plus artifacts (returns/positions/transactions + tear sheets) for the best run
+- Supports simple hyperparameter grid search inside the script (grid points run in parallel processes, see --workers)
 
 Run:
-    python examples/mlflow_hyperparameter.py --short_windows 10 14 20 --long_windows 40 50 100 \
+    python -m examples.mlflow_hyperparameter --short_windows 10 14 20 --long_windows 40 50 100 \
         --start 2021-01-01 --end 2025-01-01 --bundle nse-duckdb-parquet-bundle \
         --data-frequency minute --experiment zipline_ma
 
@@ -15,16 +15,14 @@ Ensure mlflow installed:
     pip install mlflow
 """
 
-import sys
 import os
+import time
 import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import List
 
-# Add the project root to the Python path
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
-
+import numpy as np
 import pandas as pd
 from zipline.api import order_target, symbol, set_commission, set_slippage
 from zipline.finance import commission, slippage
@@ -35,10 +33,24 @@ from engine.enhanced_base_strategy import BaseStrategy
 # Ensure bundle import side-effects (if required)
 import bundles.duckdb_polars_bundle  # noqa: F401
 
-try:
-    import mlflow
-except ImportError:  # Graceful message
-    mlflow = None
+# mlflow is imported on first use (see _import_mlflow) so --no-mlflow runs and
+# pool workers don't pay for it at module import
+mlflow = None
+Metric = Param = MlflowClient = None
+
+
+def _import_mlflow() -> bool:
+    """Import mlflow into the module globals on first call; False if it isn't installed."""
+    global mlflow, Metric, Param, MlflowClient
+    if mlflow is None:
+        try:
+            import mlflow as _mlflow
+            from mlflow.entities import Metric, Param
+            from mlflow.tracking import MlflowClient
+        except ImportError:  # Graceful message
+            return False
+        mlflow = _mlflow
+    return True
 
 
 class SimpleMAStrategy(BaseStrategy):
@@ -51,32 +63,57 @@ class SimpleMAStrategy(BaseStrategy):
         context.i = 0
         context.asset = symbol(self.asset_symbol)
         context.universe = [context.asset]
+        # Ring buffer of the last long_window prices plus running window sums (O(1) per bar)
+        context.price_buf = np.zeros(self.long_window)
+        context.short_sum = 0.0
+        context.long_sum = 0.0
         set_commission(commission.PerShare(cost=0.01, min_trade_cost=1))
         set_slippage(slippage.FixedSlippage(spread=0.01))
 
+    def before_trading_start(self, context, data):
+        """
+        Runs once per session, but not before the open: the runner schedules it at
+        market_open(minutes=1), after handle_data has already processed that minute's bar.
+        """
+        # Once per session, re-seed the ring buffer and window sums from a single
+        # minute history call so the running sums never accumulate float drift. The history
+        # window ends at the bar handle_data just processed, i.e. bar indices i-L .. i-1.
+        # This is one extra history call per session (vs. none per bar in handle_data).
+        if context.i < self.long_window:
+            return
+        prices = data.history(context.asset, "price", bar_count=self.long_window, frequency="1m").to_numpy(dtype=float)
+        if len(prices) < self.long_window or np.isnan(prices).any():
+            return
+        # Oldest -> newest bar, placed at the slots handle_data expects for bar indices i-L .. i-1
+        context.price_buf[(context.i + np.arange(self.long_window)) % self.long_window] = prices
+        context.short_sum = float(prices[-self.short_window:].sum())
+        context.long_sum = float(prices.sum())
+
     def handle_data(self, context, data):
+        price = data.current(context.asset, "price")
+        if np.isnan(price):
+            return
+
+        # Push the new price, evicting the bars that fall out of each window
+        i = context.i
+        buf = context.price_buf
+        evicted_short = buf[(i - self.short_window) % self.long_window] if i >= self.short_window else 0.0
+        evicted_long = buf[i % self.long_window]
+        buf[i % self.long_window] = price
+        context.short_sum += price - evicted_short
+        context.long_sum += price - evicted_long
         context.i += 1
+
         # Need enough bars for long window
         if context.i < self.long_window:
             return
 
-        short_mavg = data.history(
-            context.asset,
-            "price",
-            bar_count=self.short_window,
-            frequency="1m"
-        ).mean()
-
-        long_mavg = data.history(
-            context.asset,
-            "price",
-            bar_count=self.long_window,
-            frequency="1m"
-        ).mean()
-
-        if short_mavg > long_mavg:
+        # short_sum/short_window vs long_sum/long_window, cross-multiplied to avoid divisions
+        short_scaled = context.short_sum * self.long_window
+        long_scaled = context.long_sum * self.short_window
+        if short_scaled > long_scaled:
             order_target(context.asset, 100)  # simplistic sizing
-        elif short_mavg < long_mavg:
+        elif short_scaled < long_scaled:
             order_target(context.asset, 0)
 
 
@@ -98,26 +135,41 @@ def compute_metrics(results: pd.DataFrame, capital_base: float) -> dict:
     return metrics
 
 
-def log_artifacts_mlflow(runner: EnhancedZiplineRunner):
+@functools.lru_cache(maxsize=None)
+def _mlflow_client():
+    """One tracking client per process (clients aren't picklable, so workers build their own)."""
+    return MlflowClient()
+
+
+def log_batch_mlflow(run_id: str, params: dict, metrics: dict):
+    """Log params and metrics of a run in a single tracking request."""
     if mlflow is None:
         return
-    out_dir = runner.output_dir
-    # Core CSVs
-    for fname in ['returns.csv', 'positions.csv', 'transactions.csv', 'analysis_objects.pkl']:
-        fpath = os.path.join(out_dir, fname)
-        if os.path.exists(fpath):
-            mlflow.log_artifact(fpath, artifact_path='pyfolio')
-    # Figures (single + directory + pdf + zip)
-    for fname in ['full_tear_sheet.png', 'full_tear_sheet.pdf', 'full_tear_sheet_figures.zip']:
-        fpath = os.path.join(out_dir, fname)
-        if os.path.exists(fpath):
-            mlflow.log_artifact(fpath, artifact_path='pyfolio')
-    figs_dir = os.path.join(out_dir, 'tear_sheet_figures')
-    if os.path.isdir(figs_dir):
-        mlflow.log_artifacts(figs_dir, artifact_path='pyfolio/tear_sheet_figures')
-
-
-def run_single(short_window: int, long_window: int, args) -> dict:
+    timestamp = int(time.time() * 1000)
+    _mlflow_client().log_batch(
+        run_id,
+        metrics=[Metric(key, float(value), timestamp, 0) for key, value in metrics.items()],
+        params=[Param(key, str(value)) for key, value in params.items()],
+    )
+
+
+def log_artifacts_mlflow(output_dir: str):
+    if mlflow is None:
+        return
+    # The runner's output directory is per run (see run_single) and holds only this run's
+    # CSV/Parquet/pickle artifacts and tear sheets, so upload it in one call
+    if os.path.isdir(output_dir):
+        mlflow.log_artifacts(output_dir, artifact_path='pyfolio')
+
+
+def run_single(short_window: int, long_window: int, args, use_mlflow: bool = False) -> dict:
+    """Run one grid point end to end (backtest + MLflow params/metrics) and return a picklable summary.
+
+    Executed inside worker processes, so the MLflow run is opened here and the
+    runner/results objects never leave the process. Artifacts stay on disk in
+    'output_dir'; only the best run's are uploaded (see main).
+    """
+    run_name = f"sw{short_window}_lw{long_window}"
     strategy = SimpleMAStrategy(short_window=short_window, long_window=long_window, asset_symbol=args.asset)
     runner = EnhancedZiplineRunner(
         strategy=strategy,
@@ -128,9 +180,38 @@ def run_single(short_window: int, long_window: int, args) -> dict:
         data_frequency=args.data_frequency,
         live_start_date=None,
     )
-    results = runner.run()
-    metrics = compute_metrics(results, args.capital)
-    return {'runner': runner, 'results': results, 'metrics': metrics}
+    # Per-run artifact directory so concurrent runs don't overwrite each other's tear sheets
+    runner.output_dir = os.path.join(runner.output_dir, run_name)
+    os.makedirs(runner.output_dir, exist_ok=True)
+
+    params = {
+        'short_window': short_window,
+        'long_window': long_window,
+        'asset': args.asset,
+        'start': args.start,
+        'end': args.end,
+        'bundle': args.bundle,
+        'capital_base': args.capital,
+        'data_frequency': args.data_frequency,
+    }
+    metrics = {}
+    if use_mlflow and _import_mlflow():
+        mlflow.set_experiment(args.experiment)
+        with mlflow.start_run(run_name=run_name) as run:
+            try:
+                results = runner.run()
+                metrics = compute_metrics(results, args.capital)
+            finally:
+                # Params + metrics in one request (params are still recorded if the backtest failed)
+                log_batch_mlflow(run.info.run_id, params, metrics)
+    else:
+        results = runner.run()
+        metrics = compute_metrics(results, args.capital)
+    return {
+        'params': {'short_window': short_window, 'long_window': long_window},
+        'metrics': metrics,
+        'output_dir': runner.output_dir,
+    }
 
 
 def parse_args():
@@ -145,55 +226,58 @@ def parse_args():
     p.add_argument('--data-frequency', type=str, default='minute', choices=['minute', 'daily'])
     p.add_argument('--experiment', type=str, default='zipline_simple_ma')
     p.add_argument('--no-mlflow', action='store_true', help='Skip MLflow even if installed')
+    p.add_argument('--workers', type=int, default=None,
+                   help='Parallel backtest processes (default: min(grid size, CPU count); 1 = sequential)')
     return p.parse_args()
 
 
 def main():
     args = parse_args()
-    use_mlflow = (mlflow is not None) and (not args.no_mlflow)
+    use_mlflow = (not args.no_mlflow) and _import_mlflow()
     if use_mlflow:
         mlflow.set_experiment(args.experiment)
 
+    # enforce short < long; longest long-windows first so the slowest backtests start first
+    grid = sorted(
+        ((sw, lw) for lw in args.long_windows for sw in args.short_windows if sw < lw),
+        key=lambda combo: combo[1],
+        reverse=True,
+    )
+    if not grid:
+        print("No successful runs.")
+        return
+    workers = args.workers or min(len(grid), os.cpu_count() or 1)
+
     best = None
     best_key = None
 
-    for lw in args.long_windows:
-        for sw in args.short_windows:
-            if sw >= lw:
-                continue  # enforce short < long
-            run_name = f"sw{sw}_lw{lw}"
-            if use_mlflow:
-                mlflow.start_run(run_name=run_name)
-                mlflow.log_params({
-                    'short_window': sw,
-                    'long_window': lw,
-                    'asset': args.asset,
-                    'start': args.start,
-                    'end': args.end,
-                    'bundle': args.bundle,
-                    'capital_base': args.capital,
-                    'data_frequency': args.data_frequency,
-                })
-            outcome = run_single(sw, lw, args)
-            metrics = outcome['metrics']
-            if use_mlflow:
-                mlflow.log_metrics(metrics)
-                log_artifacts_mlflow(outcome['runner'])
-                mlflow.end_run()
-            # Track best by sharpe if available else total_return_pct
-            key = metrics.get('sharpe', metrics.get('total_return_pct', -1e9))
-            if best_key is None or key > best_key:
-                best_key = key
-                best = {'params': {'short_window': sw, 'long_window': lw}, 'metrics': metrics}
+    def track_best(outcome):
+        nonlocal best, best_key
+        metrics = outcome['metrics']
+        # Track best by sharpe if available else total_return_pct
+        key = metrics.get('sharpe', metrics.get('total_return_pct', -1e9))
+        if best_key is None or key > best_key:
+            best_key = key
+            best = outcome
+
+    # Each grid point is an independent backtest: fan out over processes and
+    # update best-so-far in completion order
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_single, sw, lw, args, use_mlflow) for sw, lw in grid]
+            for future in as_completed(futures):
+                track_best(future.result())
+    else:
+        for sw, lw in grid:
+            track_best(run_single(sw, lw, args, use_mlflow))
 
     if best:
-        print("Best configuration:", best)
+        print("Best configuration:", {'params': best['params'], 'metrics': best['metrics']})
         if use_mlflow:
-            # Log summary as separate run
-            mlflow.start_run(run_name='best_summary')
-            mlflow.log_params(best['params'])
-            mlflow.log_metrics(best['metrics'])
-            mlflow.end_run()
+            # Log summary as separate run; tear sheets/artifacts are uploaded for the best run only
+            with mlflow.start_run(run_name='best_summary') as run:
+                log_batch_mlflow(run.info.run_id, best['params'], best['metrics'])
+                log_artifacts_mlflow(best['output_dir'])
     else:
         print("No successful runs.")
 
@@ -1,9 +1,8 @@
-import sys
 import os
+import logging
 
+# Project root, for output paths
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
 
 import pandas as pd
 import numpy as np
@@ -20,9 +19,15 @@ from zipline.api import (
 )
 from zipline.finance import commission, slippage
 from engine.enhanced_base_strategy import BaseStrategy
-from engine.enhanced_zipline_runner import EnhancedZiplineRunner
+from engine.enhanced_zipline_runner import EnhancedZiplineRunner, write_parquet
 import bundles.duckdb_polars_bundle  # ensure bundle registration
 
+# Progress chatter goes to logger.debug so messages are only formatted when enabled;
+# set NSE_MOMENTUM_DEBUG=1 (or pass verbose=True) to see it
+logger = logging.getLogger(__name__)
+if os.environ.get('NSE_MOMENTUM_DEBUG'):
+    logger.setLevel(logging.DEBUG)
+
 class NSEMomentumStrategy(BaseStrategy):
     """
     Momentum strategy for NSE bundle using data.history() instead of pipelines.
@@ -31,17 +36,25 @@ class NSEMomentumStrategy(BaseStrategy):
     historical price data and calculating momentum factors manually.
     """
 
+    # Use known symbols from NSE bundle instead of dynamic discovery
+    KNOWN_SYMBOLS = ['BAJFINANCE', 'HDFCBANK', 'HDFC', 'HINDALCO',
+                     'RELIANCE', 'SBIN', 'BANKNIFTY', 'NIFTY']
+
     def __init__(self,
                  top_n: int = 10,
                  lookback_days: int = 63,  # ~3 months
                  rebalance_frequency: str = 'weekly',  # 'daily', 'weekly', 'monthly'
                  min_price: float = 10.0,  # Minimum stock price filter
-                 max_positions: int = 15):
+                 max_positions: int = 15,
+                 verbose: bool = False):  # Per-rebalance/per-order debug output
         self.top_n = top_n
         self.lookback_days = lookback_days
         self.rebalance_frequency = rebalance_frequency
         self.min_price = min_price
         self.max_positions = max_positions
+        self.verbose = verbose
+        if verbose:
+            logger.setLevel(logging.DEBUG)
 
     def initialize(self, context):
         """Initialize the strategy"""
@@ -54,9 +67,17 @@ class NSEMomentumStrategy(BaseStrategy):
             'min_price': self.min_price
         }
         
+        # Resolve the known symbols once; get_universe() only re-checks tradability
+        context.known_assets = []
+        for symbol_name in self.KNOWN_SYMBOLS:
+            try:
+                context.known_assets.append(symbol(symbol_name))
+            except Exception:
+                print(f"[NSE MOMENTUM] Symbol not found in bundle: {symbol_name}")
+        
         # State variables
         context.selected_assets = []
-        context.universe = []
+        context.universe_size = 0
         context.last_rebalance = None
         context.day_counter = 0
         
@@ -96,28 +117,23 @@ class NSEMomentumStrategy(BaseStrategy):
     def get_universe(self, context, data):
         """Get tradeable universe from the bundle - using known symbols approach"""
         try:
-            # Use known symbols from NSE bundle instead of dynamic discovery
-            known_symbols = ['BAJFINANCE', 'HDFCBANK', 'HDFC', 'HINDALCO', 
-                           'RELIANCE', 'SBIN', 'BANKNIFTY', 'NIFTY']
+            assets = context.known_assets
+            if not assets:
+                return []
             
-            tradeable_assets = []
-            for symbol_name in known_symbols:
-                try:
-                    asset = symbol(symbol_name)
-                    if data.can_trade(asset):
-                        # Try to get current price to ensure data availability
-                        current_price = data.current(asset, 'close')
-                        if current_price > 0:
-                            tradeable_assets.append(asset)
-                except:
-                    continue
+            # Tradability and a positive current price (data availability) as batched pre-checks
+            can_trade = data.can_trade(assets)
+            current_prices = data.current(assets, 'close')
+            tradeable_assets = [
+                asset for asset in assets
+                if can_trade[asset] and current_prices[asset] > 0
+            ]
             
-            print(f"[UNIVERSE] Found {len(tradeable_assets)} tradeable assets out of {len(known_symbols)} symbols")
+            logger.debug("[UNIVERSE] Found %d tradeable assets out of %d symbols",
+                         len(tradeable_assets), len(self.KNOWN_SYMBOLS))
             return tradeable_assets
-        except Exception as e:
-            print(f"[UNIVERSE] Error getting universe: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("[UNIVERSE] Error getting universe")
             return []
 
     def calculate_momentum_scores(self, context, data, assets):
@@ -125,75 +141,69 @@ class NSEMomentumStrategy(BaseStrategy):
         if not assets:
             return pd.Series(dtype=float)
         
+        lookback = self.lookback_days
+        min_price = self.min_price
+        
         try:
             # Get price history for momentum calculation
-            print(f"[MOMENTUM] Calculating momentum for {len(assets)} assets over {self.lookback_days} days")
+            logger.debug("[MOMENTUM] Calculating momentum for %d assets over %d days", len(assets), lookback)
             
             # Get daily price data
             prices = data.history(
                 assets,
                 'close',
-                self.lookback_days + 5,  # Extra days for safety
+                lookback + 5,  # Extra days for safety
                 '1d'
             )
             
-            print(f"[MOMENTUM] Retrieved price data: {prices.shape}")
+            logger.debug("[MOMENTUM] Retrieved price data: %s", prices.shape)
             
             if prices.empty:
                 print("[MOMENTUM] No price data available")
                 return pd.Series(dtype=float)
             
-            # Calculate momentum metrics
-            momentum_scores = pd.Series(index=assets, dtype=float)
+            # Drop assets without lookback_days of prices up front (one pass instead of per-asset checks)
+            prices = prices.dropna(axis=1, thresh=lookback)
+            if prices.empty:
+                print("[MOMENTUM] No assets with enough price history")
+                return pd.Series(dtype=float)
+            
+            # Calculate momentum metrics for the whole (lookback x assets) matrix at once
+            raw = prices.to_numpy(dtype=float)
+            filled = prices.ffill().to_numpy(dtype=float)
+            valid = ~np.isnan(raw)
+            cols = np.arange(raw.shape[1])
             
-            for asset in assets:
-                if asset not in prices.columns:
-                    continue
-                    
-                asset_prices = prices[asset].dropna()
-                
-                if len(asset_prices) < self.lookback_days:
-                    continue
-                
-                # Calculate multiple momentum metrics
-                current_price = asset_prices.iloc[-1]
-                
-                # 1. Total return over lookback period
-                start_price = asset_prices.iloc[0]
-                if start_price > 0:
-                    total_return = (current_price - start_price) / start_price
-                else:
-                    continue
-                
-                # 2. Price filter - exclude low-priced stocks
-                if current_price < self.min_price:
-                    continue
-                
-                # 3. Volatility-adjusted momentum (Sharpe-like)
-                returns = asset_prices.pct_change().dropna()
-                if len(returns) > 10:
-                    volatility = returns.std()
-                    if volatility > 0:
-                        risk_adjusted_momentum = returns.mean() / volatility
-                    else:
-                        risk_adjusted_momentum = 0
-                else:
-                    risk_adjusted_momentum = 0
-                
-                # Combined momentum score
-                momentum_score = total_return * 0.7 + risk_adjusted_momentum * 0.3
-                momentum_scores[asset] = momentum_score
+            # 1. Total return over lookback period (first valid price -> latest price)
+            start_price = raw[valid.argmax(axis=0), cols]
+            current_price = filled[-1]
+            
+            # 3. Volatility-adjusted momentum (Sharpe-like) on each asset's non-missing bars;
+            #    bars with a missing price are dropped, so returns span gaps like pct_change after dropna()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                total_return = (current_price - start_price) / start_price
+                returns = filled[1:] / filled[:-1] - 1
+                returns[~valid[1:]] = np.nan
+                n_returns = np.count_nonzero(~np.isnan(returns), axis=0)
+                mean_return = np.nansum(returns, axis=0) / n_returns
+                volatility = np.sqrt(np.nansum((returns - mean_return) ** 2, axis=0) / (n_returns - 1))
+                risk_adjusted_momentum = np.where((n_returns > 10) & (volatility > 0), mean_return / volatility, 0.0)
+            
+            # Positive start price and 2. price filter - exclude low-priced stocks
+            keep = (start_price > 0) & (current_price >= min_price)
+            
+            # Combined momentum score
+            scores = total_return * 0.7 + risk_adjusted_momentum * 0.3
+            momentum_scores = pd.Series(scores[keep], index=prices.columns[keep])
             
             # Remove invalid scores
             momentum_scores = momentum_scores.dropna()
-            print(f"[MOMENTUM] Calculated scores for {len(momentum_scores)} assets")
+            logger.debug("[MOMENTUM] Calculated scores for %d assets", len(momentum_scores))
             
             return momentum_scores
             
-        except Exception as e:
-            print(f"[MOMENTUM] Error calculating momentum: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("[MOMENTUM] Error calculating momentum")
             return pd.Series(dtype=float)
 
     def select_assets(self, momentum_scores):
@@ -205,9 +215,9 @@ class NSEMomentumStrategy(BaseStrategy):
         top_assets = momentum_scores.nlargest(min(self.top_n, len(momentum_scores)))
         selected = top_assets.index.tolist()
         
-        print(f"[SELECTION] Selected {len(selected)} assets from {len(momentum_scores)} candidates")
-        if len(selected) > 0:
-            print(f"[SELECTION] Top 3 momentum scores: {top_assets.head(3).to_dict()}")
+        logger.debug("[SELECTION] Selected %d assets from %d candidates", len(selected), len(momentum_scores))
+        if selected and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[SELECTION] Top 3 momentum scores: %s", top_assets.head(3).to_dict())
         
         return selected
 
@@ -216,14 +226,14 @@ class NSEMomentumStrategy(BaseStrategy):
         context.day_counter += 1
         current_time = get_datetime()
         
-        print(f"\n[REBALANCE] Day {context.day_counter}: {current_time}")
+        logger.debug("[REBALANCE] Day %d: %s", context.day_counter, current_time)
         
         # Get current universe
         universe = self.get_universe(context, data)
-        context.universe = [asset.symbol for asset in universe]
+        context.universe_size = len(universe)
         
         if not universe:
-            print("[REBALANCE] No tradeable assets found")
+            logger.debug("[REBALANCE] No tradeable assets found")
             return
         
         # Calculate momentum scores
@@ -232,43 +242,35 @@ class NSEMomentumStrategy(BaseStrategy):
         # Select top momentum assets
         selected_assets = self.select_assets(momentum_scores)
         context.selected_assets = selected_assets
+        selected_set = frozenset(selected_assets)
         
-        if not selected_assets:
-            print("[REBALANCE] No assets selected - liquidating portfolio")
-            # Liquidate all positions
-            for asset in context.portfolio.positions:
-                if data.can_trade(asset):
-                    order_target_percent(asset, 0)
-            return
-        
-        # Calculate equal weights
-        target_weight = 1.0 / len(selected_assets)
-        selected_set = set(selected_assets)
-        
-        print(f"[REBALANCE] Targeting {len(selected_assets)} positions at {target_weight:.3f} each")
+        # Equal weights for the selection (an empty selection liquidates everything below)
+        target_weight = 1.0 / len(selected_assets) if selected_assets else 0.0
+        if selected_assets:
+            logger.debug("[REBALANCE] Targeting %d positions at %.3f each", len(selected_assets), target_weight)
+        else:
+            logger.debug("[REBALANCE] No assets selected - liquidating portfolio")
         
-        # Place orders for selected assets
-        for asset in selected_assets:
-            if data.can_trade(asset):
-                try:
-                    order_target_percent(asset, target_weight)
-                    print(f"[ORDER] Target {target_weight:.3f} for {asset.symbol}")
-                except Exception as e:
-                    print(f"[ORDER] Failed to order {asset.symbol}: {e}")
+        # Build the order batch first: targets for the selection, then exits for everything else held
+        to_buy = [asset for asset in selected_assets if data.can_trade(asset)]
+        to_sell = [asset for asset in context.portfolio.positions
+                   if asset not in selected_set and data.can_trade(asset)]
         
-        # Liquidate positions not in current selection
-        for asset in context.portfolio.positions:
-            if asset not in selected_set and data.can_trade(asset):
-                try:
-                    order_target_percent(asset, 0)
-                    print(f"[ORDER] Liquidating {asset.symbol}")
-                except Exception as e:
-                    print(f"[ORDER] Failed to liquidate {asset.symbol}: {e}")
+        # Issue orders in one pass; failures are counted and reported once per rebalance
+        failed = 0
+        for asset, weight in [(asset, target_weight) for asset in to_buy] + [(asset, 0) for asset in to_sell]:
+            try:
+                order_target_percent(asset, weight)
+            except Exception:
+                failed += 1
+        logger.debug("[ORDER] %d targets, %d liquidations", len(to_buy), len(to_sell))
+        if failed:
+            print(f"[ORDER] {failed} of {len(to_buy) + len(to_sell)} orders failed")
         
         context.last_rebalance = current_time
         record(
             num_positions=len(selected_assets),
-            universe_size=len(universe)
+            universe_size=context.universe_size
         )
 
     def daily_record(self, context, data):
@@ -340,7 +342,10 @@ if __name__ == '__main__':
         # Save results
         out_dir = os.path.join(project_root, 'backtest_results', strategy.__class__.__name__)
         os.makedirs(out_dir, exist_ok=True)
-        results.to_csv(os.path.join(out_dir, 'backtest_results.csv'))
+        results_path = os.path.join(out_dir, 'backtest_results.parquet')
+        if not write_parquet(results, results_path):
+            results_path = os.path.join(out_dir, 'backtest_results.csv')
+            results.to_csv(results_path)
         
         # Print summary statistics
         total_return = (results['portfolio_value'].iloc[-1] / results['portfolio_value'].iloc[0] - 1) * 100
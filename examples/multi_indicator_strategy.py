@@ -10,26 +10,23 @@ Logic:
 4. Exit when Short SMA < Long SMA OR RSI > 70.
 5. Equal-weight positions, capped at 20% each.
 """
-import os
-import sys
-import pandas as pd
 import numpy as np
-import pytz
 from zipline.api import (
     order_target_percent, symbol, record, schedule_function,
     date_rules, time_rules, set_slippage, set_commission
 )
 from zipline.finance import slippage, commission
-from zipline.utils.calendar_utils import get_calendar
-
-# Ensure project root on path for engine imports when running standalone
-PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-if PROJECT_ROOT not in sys.path:
-    sys.path.insert(0, PROJECT_ROOT)
 
 from engine.enhanced_base_strategy import BaseStrategy
 from engine.enhanced_zipline_runner import EnhancedZiplineRunner
 
+# Optional C kernels for NaN-aware reductions
+try:
+    import bottleneck as bn
+    BOTTLENECK_AVAILABLE = True
+except ImportError:
+    BOTTLENECK_AVAILABLE = False
+
 SYMBOLS = ['APOLLOTYRE', 'AXISBANK', 'HDFCBANK']  # adjust per bundle
 SHORT_WIN = 20
 LONG_WIN = 50
@@ -38,6 +35,15 @@ VOL_WIN = 20
 MAX_WEIGHT = 0.2
 
 
+def _nan_mean(window):
+    """Column means of a (bars x assets) window, ignoring NaNs (bottleneck when available)."""
+    if BOTTLENECK_AVAILABLE:
+        return bn.nanmean(window, axis=0)
+    valid = ~np.isnan(window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(valid, window, 0.0).sum(axis=0) / valid.sum(axis=0)
+
+
 class MultiIndicatorStrategy(BaseStrategy):
     def initialize(self, context):
         context.assets = [symbol(s) for s in SYMBOLS]
@@ -49,43 +55,51 @@ class MultiIndicatorStrategy(BaseStrategy):
 
     def before_trading_start(self, context, data):
         context.indicators = {}
-        for asset in getattr(context, 'assets', []):
-            price_hist = data.history(asset, 'price', bar_count=LONG_WIN + 5, frequency='1d')
-            vol_hist = data.history(asset, 'volume', bar_count=VOL_WIN + 5, frequency='1d')
-            if len(price_hist) < LONG_WIN or len(vol_hist) < VOL_WIN:
-                continue
-            sma_short = price_hist.tail(SHORT_WIN).mean()
-            sma_long = price_hist.tail(LONG_WIN).mean()
-            diff = price_hist.diff().dropna()
-            up = np.where(diff > 0, diff, 0)
-            down = np.where(diff < 0, -diff, 0)
-            roll_up = pd.Series(up).rolling(RSI_WIN).mean().iloc[-1]
-            roll_down = pd.Series(down).rolling(RSI_WIN).mean().iloc[-1]
-            if roll_down == 0:
-                rsi = 100
-            else:
-                rs = roll_up / roll_down
-                rsi = 100 - (100 / (1 + rs))
-            avg_vol = vol_hist.tail(VOL_WIN).mean()
-            cur_vol = vol_hist.iloc[-1]
-            context.indicators[asset] = dict(
-                sma_short=sma_short,
-                sma_long=sma_long,
-                rsi=rsi,
-                vol=cur_vol,
-                avg_vol=avg_vol,
-                price=price_hist.iloc[-1]
-            )
+        assets = getattr(context, 'assets', [])
+        if not assets:
+            return
+        # One history call per field for the whole universe (dates x assets)
+        price_hist = data.history(assets, 'price', bar_count=LONG_WIN + 5, frequency='1d')
+        vol_hist = data.history(assets, 'volume', bar_count=VOL_WIN + 5, frequency='1d')
+        if len(price_hist) < LONG_WIN or len(vol_hist) < VOL_WIN:
+            return
+        prices = price_hist.to_numpy(dtype=float)
+        volumes = vol_hist.to_numpy(dtype=float)
+        # Trailing-window means for all assets at once (NaN-skipping like DataFrame.mean)
+        sma_short = _nan_mean(prices[-SHORT_WIN:])
+        sma_long = _nan_mean(prices[-LONG_WIN:])
+        avg_vol = _nan_mean(volumes[-VOL_WIN:])
+        # RSI only needs the last RSI_WIN diffs: average a NumPy slice instead of a full rolling pass
+        window = np.diff(prices, axis=0)[-RSI_WIN:]
+        roll_up = np.maximum(window, 0.0).mean(axis=0)
+        roll_down = np.maximum(-window, 0.0).mean(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(roll_down == 0, 100.0, 100 - (100 / (1 + roll_up / roll_down)))
+        # Structure-of-arrays: one array per metric, aligned with context.indicator_assets
+        context.indicator_assets = list(price_hist.columns)
+        context.indicators = dict(
+            sma_short=sma_short,
+            sma_long=sma_long,
+            rsi=rsi,
+            vol=volumes[-1],
+            avg_vol=avg_vol,
+            price=prices[-1]
+        )
 
     def rebalance(self, context, data):
-        if not hasattr(context, 'indicators'):
+        ind = getattr(context, 'indicators', None)
+        if not ind:
             return
-        longs = []
-        for asset, ind in context.indicators.items():
-            if ind['sma_short'] > ind['sma_long'] and ind['rsi'] < 60 and ind['vol'] > 1.2 * ind['avg_vol']:
-                longs.append(asset)
-            elif asset in context.portfolio.positions and (ind['sma_short'] < ind['sma_long'] or ind['rsi'] > 70):
-                order_target_percent(asset, 0)
+        assets = context.indicator_assets
+        # Entry/exit selection as single vector comparisons; only order placement loops
+        uptrend = ind['sma_short'] > ind['sma_long']
+        entry_mask = uptrend & (ind['rsi'] < 60) & (ind['vol'] > 1.2 * ind['avg_vol'])
+        exit_mask = ~entry_mask & ((ind['sma_short'] < ind['sma_long']) | (ind['rsi'] > 70))
+        positions = context.portfolio.positions
+        for j in np.flatnonzero(exit_mask):
+            if assets[j] in positions:
+                order_target_percent(assets[j], 0)
+        longs = [assets[j] for j in np.flatnonzero(entry_mask)]
         if longs:
             weight = min(MAX_WEIGHT, 1.0 / len(longs))
             for asset in longs:
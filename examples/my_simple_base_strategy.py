@@ -2,21 +2,18 @@
 This module implements a simple dual moving average crossover strategy.
 """
 
-import sys
 import os
 
-# Add the project root to the Python path
+# Project root, for output paths
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
 
+import numpy as np
 import pandas as pd
 from zipline.api import order_target, symbol, set_commission, set_slippage
 from zipline.finance import commission, slippage
-from zipline.data import data_portal
 
 
-from engine.enhanced_zipline_runner import EnhancedZiplineRunner
+from engine.enhanced_zipline_runner import EnhancedZiplineRunner, write_parquet
 from engine.enhanced_base_strategy import BaseStrategy
 
 import bundles.duckdb_polars_bundle
@@ -25,6 +22,9 @@ class SimpleMAStrategy(BaseStrategy):
     """
     A simple dual moving average crossover strategy.
     """
+    short_window = 14
+    long_window = 50
+
     def initialize(self, context):
         """
         Called once at the start of the algorithm.
@@ -33,57 +33,75 @@ class SimpleMAStrategy(BaseStrategy):
         context.asset = symbol("APOLLOTYRE")
         context.universe = [context.asset]
 
+        # Ring buffer of the last long_window prices plus running window sums
+        context.price_buf = np.zeros(self.long_window)
+        context.short_sum = 0.0
+        context.long_sum = 0.0
+
         # Set commission and slippage
         set_commission(commission.PerShare(cost=0.01, min_trade_cost=1))
         set_slippage(slippage.FixedSlippage(spread=0.01))
 
+    def before_trading_start(self, context, data):
+        """
+        Runs once per session, but not before the open: the runner schedules it at
+        market_open(minutes=1), after handle_data has already processed that minute's bar.
+        """
+        # Once per session, re-seed the ring buffer and window sums from a single
+        # minute history call so the running sums never accumulate float drift. The history
+        # window ends at the bar handle_data just processed, i.e. bar indices i-L .. i-1.
+        # This is one extra history call per session (vs. none per bar in handle_data).
+        if context.i < self.long_window:
+            return
+        prices = data.history(context.asset, "price", bar_count=self.long_window, frequency="1m").to_numpy(dtype=float)
+        if len(prices) < self.long_window or np.isnan(prices).any():
+            return
+        # Oldest -> newest bar, placed at the slots handle_data expects for bar indices i-L .. i-1
+        context.price_buf[(context.i + np.arange(self.long_window)) % self.long_window] = prices
+        context.short_sum = float(prices[-self.short_window:].sum())
+        context.long_sum = float(prices.sum())
+
     def handle_data(self, context, data):
         """
-        Called every day.
+        Called every bar.
         """
-        # Skip first 50 days to get full windows
+        price = data.current(context.asset, "price")
+        if np.isnan(price):
+            return
+
+        # Update both moving-average windows in O(1) instead of two
+        # data.history() calls (each allocating a new Series) per bar
+        i = context.i
+        buf = context.price_buf
+        evicted_short = buf[(i - self.short_window) % self.long_window] if i >= self.short_window else 0.0
+        evicted_long = buf[i % self.long_window]
+        buf[i % self.long_window] = price
+        context.short_sum += price - evicted_short
+        context.long_sum += price - evicted_long
+
+        # Skip the first 50 bars to get full windows
         context.i += 1
-        if context.i < 50:
+        if context.i < self.long_window:
             return
 
-        # Compute averages
-        # data.history() has to be called with the same params
-        # from above and returns a pandas dataframe.
-        short_mavg = data.history(
-            context.asset,
-            "price",
-            bar_count=14,
-            frequency="1m"
-        ).mean()
-
-        long_mavg = data.history(
-            context.asset,
-            "price",
-            bar_count=50,
-            frequency="1m"
-        ).mean()
+        # Compare short_sum/14 with long_sum/50 without dividing
+        short_scaled = context.short_sum * self.long_window
+        long_scaled = context.long_sum * self.short_window
 
         # Trading logic
-        if short_mavg > long_mavg:
+        if short_scaled > long_scaled:
             # order_target orders as many shares as needed to
             # achieve the desired number of shares.
             order_target(context.asset, 100)
-        elif short_mavg < long_mavg:
+        elif short_scaled < long_scaled:
             order_target(context.asset, 0)
 
 if __name__ == '__main__':
     # Define the strategy
     strategy = SimpleMAStrategy()
 
-    # --- Benchmark data retrieval (intraday) ---
-    from zipline.data import bundles as zlbundles  # avoid name clash with local 'bundles' package
-    from zipline.data.data_portal import DataPortal
-    from zipline.utils.calendar_utils import get_calendar
-
+    # Bundle/calendar loading happens once inside the runner (see _load_bundle/_load_benchmark)
     bundle_name = 'nse-duckdb-parquet-bundle'
-    bundle_data = zlbundles.load(bundle_name)
-
-    calendar = get_calendar('XBOM')  # Indian market calendar
 
     benchmark_symbol = 'NIFTY'
     start_date = '2021-01-01'
@@ -122,8 +140,10 @@ if __name__ == '__main__':
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
-        file_path = os.path.join(output_dir, 'backtest_results.csv')
-        results.to_pickle(file_path)
+        file_path = os.path.join(output_dir, 'backtest_results.parquet')
+        if not write_parquet(results, file_path):
+            file_path = os.path.join(output_dir, 'backtest_results.csv')
+            results.to_csv(file_path)
         
         print(f"Results saved to {file_path}")
 
@@ -18,12 +18,12 @@ Author: NSE Backtesting Engine
 Date: 2025-08-10
 """
 
-import sys
 import os
+import warnings
+from collections import namedtuple
 
+# Project root, for output paths
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
 
 import pandas as pd
 import numpy as np
@@ -41,7 +41,9 @@ from zipline.api import (
 )
 from zipline.finance import commission, slippage
 from engine.enhanced_base_strategy import BaseStrategy
-from engine.enhanced_zipline_runner import EnhancedZiplineRunner
+from engine.enhanced_zipline_runner import EnhancedZiplineRunner, write_parquet
+from engine._metrics_numba import summarize
+from engine._risk_parity import RiskParityProblem, CVXPY_AVAILABLE
 import bundles.duckdb_polars_bundle  # ensure bundle registration
 
 # Try to import riskfolio-lib for portfolio optimization
@@ -54,6 +56,151 @@ except ImportError:
     print("⚠️  Riskfolio-Lib not available - using equal weight allocation")
     print("   Install with: pip install riskfolio-lib")
 
+# Ledoit-Wolf covariance straight from scikit-learn (a riskfolio-lib dependency)
+try:
+    from sklearn.covariance import LedoitWolf
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+# Optional JIT for the screening statistics (NumPy fallback below)
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _screen_stats_numpy(P, V):
+    """Per-column screening stats of (bars x assets) close/volume arrays, NaNs skipped like dropna().
+
+    Returns (price count, volume count, last price, return count, daily return std,
+    zero-return fraction, mean of the last 30 valid volumes).
+    """
+    price_valid = ~np.isnan(P)
+    vol_valid = ~np.isnan(V)
+    filled = pd.DataFrame(P).ffill().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = filled[1:] / filled[:-1] - 1
+        returns[~price_valid[1:]] = np.nan
+        ret_valid = ~np.isnan(returns)
+        n_returns = np.count_nonzero(ret_valid, axis=0)
+        mean_ret = np.where(ret_valid, returns, 0.0).sum(axis=0) / n_returns
+        std_ret = np.sqrt(np.where(ret_valid, (returns - mean_ret) ** 2, 0.0).sum(axis=0) / (n_returns - 1))
+        zero_frac = np.count_nonzero(returns == 0, axis=0) / n_returns
+        recent = vol_valid & (np.cumsum(vol_valid[::-1], axis=0)[::-1] <= 30)
+        avg_volume = np.where(recent, V, 0.0).sum(axis=0) / recent.sum(axis=0)
+    return (price_valid.sum(axis=0), vol_valid.sum(axis=0), filled[-1],
+            n_returns, std_ret, zero_frac, avg_volume)
+
+
+_screen_stats = _screen_stats_numpy
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _screen_stats(P, V):
+        """Numba version of _screen_stats_numpy: one pass down each column, no temporaries."""
+        T, N = P.shape
+        n_prices = np.zeros(N, dtype=np.int64)
+        n_vols = np.zeros(N, dtype=np.int64)
+        last_price = np.full(N, np.nan)
+        n_returns = np.zeros(N, dtype=np.int64)
+        std_ret = np.full(N, np.nan)
+        zero_frac = np.full(N, np.nan)
+        avg_volume = np.full(N, np.nan)
+        for j in range(N):
+            prev = np.nan
+            mean = 0.0
+            m2 = 0.0
+            n = 0
+            zeros = 0
+            for t in range(T):
+                p = P[t, j]
+                if np.isnan(p):
+                    continue
+                n_prices[j] += 1
+                if not np.isnan(prev):
+                    r = p / prev - 1.0
+                    n += 1
+                    if r == 0.0:
+                        zeros += 1
+                    # Welford update
+                    delta = r - mean
+                    mean += delta / n
+                    m2 += delta * (r - mean)
+                prev = p
+            last_price[j] = prev
+            n_returns[j] = n
+            if n > 1:
+                std_ret[j] = np.sqrt(m2 / (n - 1))
+            if n > 0:
+                zero_frac[j] = zeros / n
+            # Volumes: total valid count, mean of the last 30 valid values
+            total = 0.0
+            taken = 0
+            for t in range(T - 1, -1, -1):
+                v = V[t, j]
+                if np.isnan(v):
+                    continue
+                n_vols[j] += 1
+                if taken < 30:
+                    total += v
+                    taken += 1
+            if taken > 0:
+                avg_volume[j] = total / taken
+        return n_prices, n_vols, last_price, n_returns, std_ret, zero_frac, avg_volume
+
+    # Compile (or load from the on-disk cache) at import so the first rebalance doesn't pay for it;
+    # same float32 Fortran-order layout screen_assets passes (a 2x1 array would type as C-order)
+    _screen_stats(np.ones((2, 2), dtype=np.float32, order='F'), np.ones((2, 2), dtype=np.float32, order='F'))
+
+
+# Target weights as parallel arrays (assets[i] gets values[i]); a DataFrame is only built at the Riskfolio boundary
+Weights = namedtuple('Weights', 'assets values')
+
+
+def _equal_weights(assets):
+    """Equal-weight Weights over assets"""
+    n_assets = len(assets)
+    return Weights(np.asarray(assets, dtype=object), np.full(n_assets, 1.0 / n_assets if n_assets else 0.0))
+
+
+# Incremental _rolling_cov updates allowed before the sums are rebuilt from scratch,
+# so subtract/add rounding error cannot accumulate over a long backtest
+_COV_REBUILD_EVERY = 20
+
+
+def _rolling_cov(state, R, dates, columns):
+    """Sample covariance (ddof=1) of a (T x N) returns array, S/(T-1) - s s^T/(T(T-1)) (no centered copy).
+
+    'state' keeps the last window (R, dates, columns) with its running S = sum x x^T and
+    s = sum x. If the assets match and the overlapping days are unchanged (no split
+    re-adjustment), only the days that left/entered the window are subtracted/added;
+    otherwise, and every _COV_REBUILD_EVERY updates, the sums are rebuilt from scratch.
+    """
+    T = R.shape[0]
+    prev = state.get('R')
+    k = None
+    updates = state.get('updates', 0)
+    if (prev is not None and updates < _COV_REBUILD_EVERY
+            and prev.shape == R.shape and state['columns'].equals(columns)):
+        prev_dates = state['dates']
+        if dates[0] in prev_dates:
+            k = prev_dates.get_loc(dates[0])
+            if not np.array_equal(prev[k:], R[:T - k]):
+                k = None
+    if k is None:
+        S = R.T @ R
+        s = R.sum(axis=0)
+        updates = 0
+    else:
+        leaving, entering = prev[:k], R[T - k:]
+        S = state['S'] + entering.T @ entering - leaving.T @ leaving
+        s = state['s'] + entering.sum(axis=0) - leaving.sum(axis=0)
+        updates += 1
+    state.update(R=R.copy(), dates=dates, columns=columns, S=S, s=s, updates=updates)
+    return S / (T - 1) - np.outer(s, s) / (T * (T - 1))
+
 
 class NSEPortfolioOptimizationStrategy(BaseStrategy):
     """
@@ -63,6 +210,22 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
     weights using modern portfolio theory principles adapted for Indian markets.
     """
 
+    # Expanded universe of NSE stocks and indices; resolved to assets once in initialize()
+    NSE_SYMBOLS = [
+        # Large cap stocks
+        'RELIANCE', 'TCS', 'HDFCBANK', 'INFY', 'HINDUNILVR',
+        'ICICIBANK', 'SBIN', 'BHARTIARTL', 'ITC', 'KOTAKBANK',
+        'HDFC', 'BAJFINANCE', 'ASIANPAINT', 'MARUTI', 'AXISBANK',
+        'NESTLEIND', 'ULTRACEMCO', 'TITAN', 'SUNPHARMA', 'WIPRO',
+
+        # Mid cap additions
+        'HINDALCO', 'NTPC', 'POWERGRID', 'ONGC', 'GRASIM',
+        'COALINDIA', 'TECHM', 'HCLTECH', 'TATAMOTORS', 'JSWSTEEL',
+
+        # Indices for benchmark/diversification
+        'NIFTY', 'BANKNIFTY'
+    ]
+
     def __init__(self,
                  leverage: float = 1.0,          # Portfolio leverage (1.0 = no leverage)
                  window_length: int = 126,       # 6 months of trading days (21*6)
@@ -85,6 +248,7 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
         self.min_volume = min_volume
         self.target_return = target_return
         self.rebalance_frequency = rebalance_frequency
+        self._rp_problems = {}  # universe size -> RiskParityProblem
         
         print(f"[NSE PORTFOLIO] Strategy initialized:")
         print(f"  Leverage: {leverage}x")
@@ -111,6 +275,18 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
         context.screened_assets = []
         context.last_rebalance = None
         context.day_counter = 0
+        context.panel_cache = {}  # (session date, field) -> history panel, see _fetch_panel
+        context.cov_state = {}    # last correlation-screen window and its running sums, see _rolling_cov
+        context.last_weights_key = None  # (sids, returns hash, target) of the last optimization
+        context.last_weights = None
+        
+        # Resolve the universe symbols once; get_universe() only re-checks tradability
+        context.known_assets = []
+        for symbol_name in self.NSE_SYMBOLS:
+            try:
+                context.known_assets.append(symbol(symbol_name))
+            except Exception:
+                print(f"[NSE PORTFOLIO] Symbol not found in bundle: {symbol_name}")
         
         # Schedule rebalancing based on frequency
         if self.rebalance_frequency == 'daily':
@@ -148,41 +324,36 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
     def get_universe(self, context, data):
         """Get expanded tradeable universe from NSE bundle"""
         try:
-            # Expanded universe of NSE stocks and indices
-            nse_symbols = [
-                # Large cap stocks
-                'RELIANCE', 'TCS', 'HDFCBANK', 'INFY', 'HINDUNILVR',
-                'ICICIBANK', 'SBIN', 'BHARTIARTL', 'ITC', 'KOTAKBANK',
-                'HDFC', 'BAJFINANCE', 'ASIANPAINT', 'MARUTI', 'AXISBANK',
-                'NESTLEIND', 'ULTRACEMCO', 'TITAN', 'SUNPHARMA', 'WIPRO',
-                
-                # Mid cap additions
-                'HINDALCO', 'NTPC', 'POWERGRID', 'ONGC', 'GRASIM',
-                'COALINDIA', 'TECHM', 'HCLTECH', 'TATAMOTORS', 'JSWSTEEL',
-                
-                # Indices for benchmark/diversification
-                'NIFTY', 'BANKNIFTY'
-            ]
+            assets = context.known_assets
+            if not assets:
+                return []
             
-            tradeable_assets = []
-            for symbol_name in nse_symbols:
-                try:
-                    asset = symbol(symbol_name)
-                    if data.can_trade(asset):
-                        # Basic data availability check
-                        current_price = data.current(asset, 'close')
-                        if current_price > 0:
-                            tradeable_assets.append(asset)
-                except:
-                    continue
+            # One batched tradability check and one batched price lookup for the whole list
+            can_trade = data.can_trade(assets)
+            current_prices = data.current(assets, 'close')
+            tradeable_assets = [
+                asset for asset in assets
+                if can_trade[asset] and current_prices[asset] > 0
+            ]
             
-            print(f"[UNIVERSE] Found {len(tradeable_assets)} tradeable assets from {len(nse_symbols)} symbols")
+            print(f"[UNIVERSE] Found {len(tradeable_assets)} tradeable assets from {len(self.NSE_SYMBOLS)} symbols")
             return tradeable_assets
             
         except Exception as e:
             print(f"[UNIVERSE] Error getting universe: {e}")
             return []
 
+    def _fetch_panel(self, context, data, assets, field, bars):
+        """Daily history for assets, served from the session's cached (date, field) panel when it covers the request"""
+        key = (get_datetime().date(), field)
+        panel = context.panel_cache.get(key)
+        if panel is None or len(panel) < bars or not set(assets).issubset(panel.columns):
+            panel = data.history(list(assets), field, bars, '1d')
+            # Only today's panels are ever reused
+            context.panel_cache = {k: v for k, v in context.panel_cache.items() if k[0] == key[0]}
+            context.panel_cache[key] = panel
+        return panel[list(assets)].iloc[-bars:]
+
     def screen_assets(self, context, data, universe):
         """Screen assets based on liquidity, volatility and price filters"""
         if not universe:
@@ -192,66 +363,49 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
             print(f"[SCREENING] Applying filters to {len(universe)} assets")
             
             # Get extended price history for screening
-            prices = data.history(
+            prices = self._fetch_panel(
+                context, data,
                 universe,
                 'close',
-                self.window_length + 10,  # Extra days for calculation safety
-                '1d'
+                self.window_length + 10  # Extra days for calculation safety
             )
             
             # Get volume data for liquidity screening
-            volumes = data.history(
+            volumes = self._fetch_panel(
+                context, data,
                 universe,
                 'volume',
-                self.window_length,
-                '1d'
+                self.window_length
             )
             
-            screened_assets = []
+            # Whole-universe filters from one pass of per-column stats over the (bars x assets) arrays
+            volumes = volumes.reindex(columns=prices.columns)
+            # float32 is plenty for filter thresholds and halves the bytes each pass moves;
+            # Fortran order so each column is contiguous for the kernel and the layout always
+            # matches the import-time warm-up (no second compile at the first rebalance)
+            (n_prices, n_vols, current_price, n_returns,
+             std_ret, zero_frac, avg_volume) = _screen_stats(
+                np.asfortranarray(prices.to_numpy(dtype=np.float32)),
+                np.asfortranarray(volumes.to_numpy(dtype=np.float32))
+            )
             
-            for asset in universe:
-                try:
-                    if asset not in prices.columns or asset not in volumes.columns:
-                        continue
-                    
-                    asset_prices = prices[asset].dropna()
-                    asset_volumes = volumes[asset].dropna()
-                    
-                    if len(asset_prices) < self.window_length or len(asset_volumes) < 30:
-                        continue
-                    
-                    current_price = asset_prices.iloc[-1]
-                    
-                    # 1. Price filter
-                    if current_price < self.min_price:
-                        continue
-                    
-                    # 2. Volatility filter
-                    returns = asset_prices.pct_change().dropna()
-                    if len(returns) < 60:  # Need sufficient data
-                        continue
-                    
-                    volatility = returns.std() * np.sqrt(252)  # Annualized volatility
-                    if not (self.min_volatility <= volatility <= self.max_volatility):
-                        continue
-                    
-                    # 3. Volume/Liquidity filter
-                    avg_volume = asset_volumes.tail(30).mean()  # 30-day average volume
-                    avg_dollar_volume = avg_volume * current_price
-                    
-                    if avg_dollar_volume < self.min_volume:
-                        continue
-                    
-                    # 4. Data quality check - avoid stocks with too many zero returns
-                    zero_return_pct = (returns == 0).sum() / len(returns)
-                    if zero_return_pct > 0.1:  # More than 10% zero returns
-                        continue
-                    
-                    screened_assets.append(asset)
-                    
-                except Exception as e:
-                    print(f"[SCREENING] Error screening {asset}: {e}")
-                    continue
+            with np.errstate(invalid='ignore'):
+                # 1. Price filter (and enough price/volume history)
+                history_ok = (n_prices >= self.window_length) & (n_vols >= 30)
+                price_ok = current_price >= self.min_price
+                
+                # 2. Volatility filter (need sufficient data)
+                volatility = std_ret * np.sqrt(252)  # Annualized volatility
+                vol_ok = (n_returns >= 60) & (volatility >= self.min_volatility) & (volatility <= self.max_volatility)
+                
+                # 3. Volume/Liquidity filter (30-day average dollar volume)
+                liq_ok = avg_volume * current_price >= self.min_volume
+                
+                # 4. Data quality check - avoid stocks with more than 10% zero returns
+                zero_ok = zero_frac <= 0.1
+            
+            mask = history_ok & price_ok & vol_ok & liq_ok & zero_ok
+            screened_assets = [prices.columns[i] for i in np.flatnonzero(mask)]
             
             print(f"[SCREENING] {len(screened_assets)} assets passed screening from {len(universe)}")
             return screened_assets
@@ -266,25 +420,19 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
             return screened_assets
         
         try:
-            # Calculate average dollar volume for ranking
-            volumes = data.history(screened_assets, 'volume', 30, '1d')
-            prices = data.history(screened_assets, 'close', 30, '1d')
-            
-            asset_scores = {}
-            
-            for asset in screened_assets:
-                try:
-                    if asset in volumes.columns and asset in prices.columns:
-                        avg_volume = volumes[asset].tail(20).mean()
-                        avg_price = prices[asset].tail(20).mean()
-                        dollar_volume = avg_volume * avg_price
-                        asset_scores[asset] = dollar_volume
-                except:
-                    continue
+            # Calculate average dollar volume for ranking: 20-day mean volume x mean price,
+            # sliced from the panel screen_assets already used (no extra history call)
+            volumes = self._fetch_panel(context, data, screened_assets, 'volume', 20).to_numpy(dtype=np.float32)
+            prices = self._fetch_panel(context, data, screened_assets, 'close', 20).to_numpy(dtype=np.float32)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)  # all-NaN columns
+                scores = np.nanmean(volumes, axis=0) * np.nanmean(prices, axis=0)
+            scores = np.where(np.isnan(scores), -np.inf, scores)
             
-            # Sort by dollar volume (descending) and select top N
-            sorted_assets = sorted(asset_scores.items(), key=lambda x: x[1], reverse=True)
-            top_assets = [asset for asset, score in sorted_assets[:self.top_n]]
+            # Top N by dollar volume (descending) without sorting the whole list
+            top_idx = np.argpartition(-scores, self.top_n - 1)[:self.top_n]
+            top_idx = top_idx[np.argsort(-scores[top_idx], kind='stable')]
+            top_assets = [screened_assets[i] for i in top_idx]
             
             print(f"[SELECTION] Selected top {len(top_assets)} assets by liquidity")
             return top_assets
@@ -302,25 +450,14 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
             if n_assets == 0:
                 return None
             
-            weights = pd.DataFrame(
-                np.ones(n_assets) / n_assets,
-                index=returns.columns,
-                columns=['weights']
-            )
             print(f"[OPTIMIZATION] Using equal weights: {1/n_assets:.3f} each for {n_assets} assets")
-            return weights
+            return _equal_weights(returns.columns)
         
         try:
             # Data quality checks
             if len(returns.columns) < 3:
                 print(f"[OPTIMIZATION] Too few assets ({len(returns.columns)}), using equal weights")
-                n_assets = len(returns.columns)
-                weights = pd.DataFrame(
-                    np.ones(n_assets) / n_assets,
-                    index=returns.columns,
-                    columns=['weights']
-                )
-                return weights
+                return _equal_weights(returns.columns)
             
             # Check for and handle problematic returns
             returns_clean = returns.copy()
@@ -336,43 +473,49 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
             
             if len(returns_clean.columns) < 3:
                 print(f"[OPTIMIZATION] Too few valid assets after cleaning, using equal weights")
-                n_assets = len(returns_clean.columns)
-                weights = pd.DataFrame(
-                    np.ones(n_assets) / n_assets,
-                    index=returns_clean.columns,
-                    columns=['weights']
-                )
-                return weights
+                return _equal_weights(returns_clean.columns)
             
             # Suppress numpy warnings during optimization
-            import warnings
             with warnings.catch_warnings():
                 warnings.filterwarnings("ignore", category=RuntimeWarning)
                 
                 # Use Riskfolio-Lib for optimization with more robust settings
                 port = rp.Portfolio(returns=returns_clean)
                 
-                # Calculate asset statistics with robust methods
-                port.assets_stats(
-                    method_mu="hist",     # Historical mean
-                    method_cov="ledoit"   # Ledoit-Wolf shrinkage (more stable)
-                )
+                # Calculate asset statistics with robust methods: historical mean and
+                # Ledoit-Wolf shrinkage (more stable), fitted once on the raw array
+                if SKLEARN_AVAILABLE:
+                    R = returns_clean.to_numpy(dtype=float)
+                    port.mu = pd.DataFrame(R.mean(axis=0)[None, :], columns=returns_clean.columns)
+                    port.cov = pd.DataFrame(
+                        LedoitWolf().fit(R).covariance_,
+                        index=returns_clean.columns,
+                        columns=returns_clean.columns
+                    )
+                else:
+                    port.assets_stats(
+                        method_mu="hist",     # Historical mean
+                        method_cov="ledoit"   # Ledoit-Wolf shrinkage (more stable)
+                    )
                 
                 # Set constraints for more stable optimization
                 port.lowerret = max(0.0005, self.target_return)  # Minimum target return
                 port.upperlng = 0.40    # Maximum 40% in any single asset
                 port.lowerlng = 0.02    # Minimum 2% in any asset (if selected)
                 
-                # Try risk parity first (more stable than mean-variance)
+                # Try risk parity first (more stable than mean-variance); the cached
+                # parameterized problem first, Riskfolio's own builder if that fails
                 try:
-                    weights = port.rp_optimization(
-                        model="Classic",
-                        rm="MV",           # Mean-Variance
-                        rf=0.0,            # Risk-free rate
-                        b=None,            # No benchmark
-                        hist=True          # Use historical data
-                    )
-                except:
+                    weights = self._solve_risk_parity(port, returns_clean.columns)
+                    if weights is None:
+                        weights = port.rp_optimization(
+                            model="Classic",
+                            rm="MV",           # Mean-Variance
+                            rf=0.0,            # Risk-free rate
+                            b=None,            # No benchmark
+                            hist=True          # Use historical data
+                        )
+                except Exception:
                     # Fallback to equal risk contribution
                     try:
                         weights = port.rp_optimization(
@@ -382,75 +525,94 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
                             b=None,
                             hist=True
                         )
-                    except:
+                    except Exception:
                         weights = None
             
             if weights is not None and not weights.empty:
+                # Leave the Riskfolio DataFrame: one weight array aligned with its index
+                values = weights.iloc[:, 0].to_numpy(dtype=float)
+                
                 # Check for extreme concentrations and adjust if needed
-                max_weight = weights.iloc[:, 0].max()
+                max_weight = values.max()
                 if max_weight > 0.5:  # More than 50% in single asset
                     print(f"[OPTIMIZATION] Extreme concentration detected ({max_weight:.1%}), applying caps")
                     # Cap maximum weight and redistribute
-                    weights_capped = weights.copy()
-                    weights_capped.iloc[:, 0] = np.minimum(weights_capped.iloc[:, 0], 0.4)
+                    values = np.minimum(values, 0.4)
                     # Renormalize
-                    weights_capped = weights_capped / weights_capped.sum()
-                    weights = weights_capped
+                    values = values / values.sum()
                 
-                # Rename column to match expected format
-                weights.columns = ['weights']
-                print(f"[OPTIMIZATION] Riskfolio optimization successful for {len(weights)} assets")
-                print(f"[OPTIMIZATION] Weight range: {weights['weights'].min():.3f} - {weights['weights'].max():.3f}")
-                return weights
+                print(f"[OPTIMIZATION] Riskfolio optimization successful for {len(values)} assets")
+                print(f"[OPTIMIZATION] Weight range: {values.min():.3f} - {values.max():.3f}")
+                return Weights(np.asarray(weights.index, dtype=object), values)
             else:
                 # Fallback to equal weights
-                n_assets = len(returns_clean.columns)
-                weights = pd.DataFrame(
-                    np.ones(n_assets) / n_assets,
-                    index=returns_clean.columns,
-                    columns=['weights']
-                )
                 print(f"[OPTIMIZATION] Riskfolio failed, using equal weights")
-                return weights
+                return _equal_weights(returns_clean.columns)
                 
         except Exception as e:
             print(f"[OPTIMIZATION] Error in Riskfolio optimization: {e}")
             # Fallback to equal weights
-            n_assets = len(returns.columns)
-            weights = pd.DataFrame(
-                np.ones(n_assets) / n_assets,
-                index=returns.columns,
-                columns=['weights']
-            )
             print(f"[OPTIMIZATION] Using equal weights fallback")
-            return weights
+            return _equal_weights(returns.columns)
+
+    def _solve_risk_parity(self, port, assets):
+        """MV risk parity through a RiskParityProblem cached per universe size; None if unavailable or failed"""
+        if not CVXPY_AVAILABLE:
+            return None
+        try:
+            n_assets = len(assets)
+            problem = self._rp_problems.get(n_assets)
+            if problem is None:
+                problem = self._rp_problems[n_assets] = RiskParityProblem(n_assets)
+            values = problem.solve(
+                np.asarray(port.mu, dtype=float).ravel(),
+                np.asarray(port.cov, dtype=float),
+                port.lowerret
+            )
+        except Exception as e:
+            print(f"[OPTIMIZATION] Cached risk parity solve failed: {e}")
+            return None
+        if values is None:
+            return None
+        return pd.DataFrame(values, index=assets, columns=['weights'])
 
-    def exec_trades(self, data, assets, weights):
-        """Execute trades for given assets and weights"""
-        if weights is None or weights.empty:
+    def exec_trades(self, data, weights):
+        """Execute trades for the given target weights"""
+        if weights is None or len(weights.assets) == 0:
             return
         
         executed_orders = 0
+        open_orders = get_open_orders()  # one snapshot {asset: [orders]} instead of a lookup per asset
         
-        for asset in assets:
+        for asset, target_percent in zip(weights.assets, weights.values):
             try:
-                # Check if asset is tradeable and has weight
-                if (data.can_trade(asset) and 
-                    asset in weights.index and 
-                    not get_open_orders(asset)):
+                # Only place order if asset is tradeable and weight is significant
+                if (abs(target_percent) > 0.001 and  # 0.1% minimum
+                    data.can_trade(asset) and 
+                    asset not in open_orders):
                     
-                    target_percent = weights.at[asset, 'weights']
-                    
-                    # Only place order if weight is significant
-                    if abs(target_percent) > 0.001:  # 0.1% minimum
-                        order_target_percent(asset, target_percent)
-                        executed_orders += 1
-                        print(f"[ORDER] Target {target_percent:.3f} for {asset.symbol}")
+                    order_target_percent(asset, target_percent)
+                    executed_orders += 1
+                    print(f"[ORDER] Target {target_percent:.3f} for {asset.symbol}")
                     
             except Exception as e:
                 print(f"[ORDER] Failed to order {asset.symbol}: {e}")
         
-        print(f"[EXECUTION] Executed {executed_orders} orders out of {len(assets)} assets")
+        print(f"[EXECUTION] Executed {executed_orders} orders out of {len(weights.assets)} assets")
+
+    def _divest(self, data, assets):
+        """Close out positions in assets (target 0%) without building a weights frame"""
+        divested = 0
+        open_orders = get_open_orders()
+        for asset in assets:
+            try:
+                if data.can_trade(asset) and asset not in open_orders:
+                    order_target_percent(asset, 0.0)
+                    divested += 1
+            except Exception as e:
+                print(f"[ORDER] Failed to divest {asset.symbol}: {e}")
+        
+        print(f"[EXECUTION] Divested {divested} of {len(assets)} assets")
 
     def rebalance(self, context, data):
         """Main rebalancing logic"""
@@ -465,6 +627,15 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
             print("[REBALANCE] No tradeable assets found")
             return
         
+        # One close + one volume panel for the whole universe, covering every stage's window;
+        # screening, selection and optimization below slice these instead of re-querying history
+        panel_bars = max(self.window_length + 10, self.bar_count, 30)
+        try:
+            self._fetch_panel(context, data, universe, 'close', panel_bars)
+            self._fetch_panel(context, data, universe, 'volume', panel_bars)
+        except Exception as e:
+            print(f"[REBALANCE] Error prefetching history: {e}")
+        
         # Step 2: Screen assets
         screened_assets = self.screen_assets(context, data, universe)
         if not screened_assets:
@@ -483,48 +654,52 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
         
         # Step 4: Get historical data for optimization
         try:
-            prices = data.history(
+            prices = self._fetch_panel(
+                context, data,
                 selected_assets,
                 'close',
-                self.bar_count,
-                '1d'
+                self.bar_count
             )
             
-            # Calculate returns and clean data more robustly
-            returns = prices.pct_change()[1:]  # Skip first row (NaN)
+            # Returns and column filters in one NumPy pass (pct_change semantics: forward-filled prices)
+            P = prices.ffill().to_numpy(dtype=float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                R = P[1:] / P[:-1] - 1  # Skip first row (NaN)
             
-            # Remove assets with insufficient data
-            min_observations = max(30, int(0.6 * len(returns)))  # At least 60% of observations
-            sufficient_data = returns.count() >= min_observations
-            returns = returns.loc[:, sufficient_data]
-            
-            # Remove assets with all zero returns or extreme values
-            returns = returns.loc[:, (returns != 0).any(axis=0)]
-            returns = returns.loc[:, (returns.abs() < 0.5).all(axis=0)]  # Cap at 50% daily moves
-            
-            # Final NaN cleanup
-            returns.dropna(how='any', axis=1, inplace=True)
+            # Keep assets with sufficient data (at least 60% of observations), not all-zero
+            # returns and no extreme values (cap at 50% daily moves) - the last one also rejects NaNs
+            min_observations = max(30, int(0.6 * len(R)))
+            valid = (
+                (np.isfinite(R).sum(axis=0) >= min_observations)
+                & (R != 0).any(axis=0)
+                & (np.abs(R) < 0.5).all(axis=0)
+            )
+            R = R[:, valid]
+            columns = prices.columns[valid]
             
-            # Check correlation issues - remove highly correlated assets
-            if len(returns.columns) > 3:
-                corr_matrix = returns.corr()
-                # Find pairs with correlation > 0.95
-                high_corr_pairs = []
-                for i in range(len(corr_matrix.columns)):
-                    for j in range(i+1, len(corr_matrix.columns)):
-                        if abs(corr_matrix.iloc[i, j]) > 0.95:
-                            high_corr_pairs.append((corr_matrix.columns[i], corr_matrix.columns[j]))
+            # Check correlation issues - remove highly correlated assets (corr > 0.95)
+            if R.shape[1] > 3:
+                # Correlation from the post-hoc covariance (no centered copy), updated from the
+                # previous rebalance's sums when only the window moved
+                cov = _rolling_cov(context.cov_state, R, prices.index[1:], columns)
+                sd = np.sqrt(np.diag(cov))
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    C = cov / np.outer(sd, sd)
+                high_corr_pairs = np.argwhere(np.triu(np.abs(C) > 0.95, k=1))
                 
-                # Remove one asset from each highly correlated pair (keep the more liquid one)
-                assets_to_remove = set()
-                for asset1, asset2 in high_corr_pairs:
-                    if asset1 not in assets_to_remove and asset2 not in assets_to_remove:
-                        # Simple heuristic: remove the second one
-                        assets_to_remove.add(asset2)
+                # Remove one asset from each highly correlated pair (pairs in row-major order,
+                # skipping pairs where either side is already removed): drop the second one
+                keep = np.ones(R.shape[1], dtype=bool)
+                for i, j in high_corr_pairs:
+                    if keep[i] and keep[j]:
+                        keep[j] = False
                 
-                if assets_to_remove:
-                    print(f"[REBALANCE] Removing {len(assets_to_remove)} highly correlated assets")
-                    returns = returns.drop(columns=list(assets_to_remove))
+                if not keep.all():
+                    print(f"[REBALANCE] Removing {int((~keep).sum())} highly correlated assets")
+                    R = R[:, keep]
+                    columns = columns[keep]
+            
+            returns = pd.DataFrame(R, index=prices.index[1:], columns=columns)
             
             if returns.empty or len(returns.columns) < 3:
                 print("[REBALANCE] Insufficient valid returns data for optimization")
@@ -542,26 +717,33 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
         divest_assets = list(current_positions - target_assets)
         
         if divest_assets:
-            divest_weights = pd.DataFrame(
-                np.zeros(len(divest_assets)),
-                index=divest_assets,
-                columns=['weights']
-            )
             print(f"[REBALANCE] Divesting {len(divest_assets)} assets")
-            self.exec_trades(data, divest_assets, divest_weights)
-        
-        # Step 6: Compute optimal weights
-        weights = self.compute_weights(returns)
+            self._divest(data, divest_assets)
+        
+        # Step 6: Compute optimal weights, reusing the previous solution when the assets,
+        # their returns window and the return target are all unchanged
+        weights_key = (
+            tuple(asset.sid for asset in returns.columns),
+            hash(returns.to_numpy().tobytes()),
+            self.target_return,
+        )
+        if weights_key == context.last_weights_key:
+            weights = context.last_weights
+            print("[REBALANCE] Assets and returns unchanged, reusing previous weights")
+        else:
+            weights = self.compute_weights(returns)
+            context.last_weights_key = weights_key
+            context.last_weights = weights
         
         if weights is not None:
             # Apply leverage
-            weights *= self.leverage
+            weights = weights._replace(values=weights.values * self.leverage)
             
             print(f"[REBALANCE] Applying {self.leverage}x leverage")
-            print(f"[REBALANCE] Portfolio target weights sum: {weights['weights'].sum():.3f}")
+            print(f"[REBALANCE] Portfolio target weights sum: {weights.values.sum():.3f}")
             
             # Execute trades for target assets
-            self.exec_trades(data, returns.columns, weights)
+            self.exec_trades(data, weights)
         
         # Record metrics
         context.last_rebalance = current_time
@@ -578,12 +760,8 @@ class NSEPortfolioOptimizationStrategy(BaseStrategy):
         cash = context.portfolio.cash
         positions_count = len(context.portfolio.positions)
         
-        # Calculate actual leverage
-        total_positions_value = sum(
-            abs(position.amount * position.last_sale_price) 
-            for position in context.portfolio.positions.values()
-        )
-        actual_leverage = total_positions_value / portfolio_value if portfolio_value > 0 else 0
+        # Actual leverage: gross exposure / portfolio value, already maintained by zipline's ledger
+        actual_leverage = context.account.gross_leverage if portfolio_value > 0 else 0
         
         record(
             portfolio_value=portfolio_value,
@@ -656,21 +834,23 @@ if __name__ == '__main__':
         # Save results
         out_dir = os.path.join(project_root, 'backtest_results', strategy.__class__.__name__)
         os.makedirs(out_dir, exist_ok=True)
-        results.to_csv(os.path.join(out_dir, 'portfolio_optimization_results.csv'))
-        
-        # Calculate and display summary statistics
-        total_return = (results['portfolio_value'].iloc[-1] / results['portfolio_value'].iloc[0] - 1) * 100
-        returns = results['returns']
-        volatility = returns.std() * np.sqrt(252) * 100  # Annualized
-        sharpe = (returns.mean() / returns.std() * np.sqrt(252)) if returns.std() > 0 else 0
-        max_drawdown = ((results['portfolio_value'] / results['portfolio_value'].cummax() - 1).min()) * 100
-        
-        print(f"📈 Total Return: {total_return:.2f}%")
-        print(f"📊 Annualized Volatility: {volatility:.2f}%")
-        print(f"⚡ Sharpe Ratio: {sharpe:.2f}")
-        print(f"📉 Maximum Drawdown: {max_drawdown:.2f}%")
-        print(f"💾 Results saved to: {out_dir}")
-        print("🎉 Portfolio optimization strategy completed!")
+        results_path = os.path.join(out_dir, 'portfolio_optimization_results.parquet')
+        if not write_parquet(results, results_path):
+            results_path = os.path.join(out_dir, 'portfolio_optimization_results.csv')
+            results.to_csv(results_path)
+        
+        # Calculate and display summary statistics (one pass over the returns)
+        total_return, _, volatility, sharpe, max_drawdown, win_rate = summarize(results['returns'])
+        
+        print("\n".join([
+            f"📈 Total Return: {total_return * 100:.2f}%",
+            f"📊 Annualized Volatility: {volatility * 100:.2f}%",
+            f"⚡ Sharpe Ratio: {sharpe:.2f}",
+            f"📉 Maximum Drawdown: {max_drawdown * 100:.2f}%",
+            f"🎯 Win Rate: {win_rate * 100:.2f}%",
+            f"💾 Results saved to: {out_dir}",
+            "🎉 Portfolio optimization strategy completed!",
+        ]))
         
     else:
         print("❌ Backtest failed - check logs above")
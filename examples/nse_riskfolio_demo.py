@@ -0,0 +1,206 @@
+"""NSE Riskfolio demo: solve every rebalance's optimization up front, in parallel, then backtest.
+
+Each weekly re-optimization (volatility screen + Ledoit-Wolf covariance + Riskfolio MV risk parity)
+depends only on its lookback window of closes, so the whole schedule is embarrassingly parallel:
+- the closes for the full span are read from the bundle once
+- the matrix is placed in shared memory (workers attach to it, nothing is re-pickled per task)
+- a process pool solves one rebalance date per task
+- NSERiskfolioStrategy receives the {date: weights} dict and only looks weights up at its weekly rebalance
+  (the first precomputed date is also solved in-loop and the two are compared)
+
+Run:
+    python -m examples.nse_riskfolio_demo --start 2019-01-01 --end 2021-01-01 \
+        --bundle nse-local-minute-bundle --workers 4
+"""
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from zipline.data import bundles as zlbundles  # avoid name clash with local 'bundles' package
+from zipline.data.data_portal import DataPortal
+from zipline.utils.calendar_utils import get_calendar
+
+from engine.enhanced_zipline_runner import EnhancedZiplineRunner
+from engine._metrics_numba import summarize
+from strategies.nse_riskfolio_strategy import NSERiskfolioStrategy, riskfolio_weights, screen_returns
+
+# Same universe as NSERiskfolioStrategy.select_universe
+SYMBOLS = ['BAJFINANCE', 'BANKNIFTY', 'HDFCBANK', 'HDFC', 'HINDALCO', 'NIFTY50', 'RELIANCE', 'SBIN']
+
+# Worker-side state, set once per process by _attach
+_shm = None
+_closes = None
+_config = None
+
+
+def load_closes(bundle, symbols, start, end, lookback):
+    """Daily prices (sessions x symbols) covering [start - lookback sessions, end] in one history read.
+
+    Read through a DataPortal with the bundle's adjustment reader, so splits and dividends are
+    applied as data.history applies them in the strategy; raw bar-reader closes would show
+    each split as a one-day crash. Adjustments are taken as of end, which scales a window
+    that ends earlier by a constant and leaves its returns unchanged.
+    """
+    bundle_data = zlbundles.load(bundle)
+    found, assets = [], []
+    for symbol_name in symbols:
+        try:
+            assets.append(bundle_data.asset_finder.lookup_symbol(symbol_name, as_of_date=None))
+            found.append(symbol_name)
+        except Exception:
+            print(f"⚠️  Symbol not found in bundle: {symbol_name}")
+    calendar = get_calendar('XBOM')
+    portal = DataPortal(
+        bundle_data.asset_finder,
+        trading_calendar=calendar,
+        first_trading_day=bundle_data.equity_daily_bar_reader.first_trading_day,
+        equity_daily_reader=bundle_data.equity_daily_bar_reader,
+        equity_minute_reader=bundle_data.equity_minute_bar_reader,
+        adjustment_reader=bundle_data.adjustment_reader,
+    )
+    # Calendar days of warm-up so the first rebalance has a full lookback window
+    warmup_start = pd.Timestamp(start) - pd.Timedelta(days=int(lookback * 1.6) + 10)
+    sessions = calendar.sessions_in_range(warmup_start, pd.Timestamp(end))
+    # 'price' (forward-filled close) is the field the strategy's history calls use
+    prices = portal.get_history_window(
+        assets, sessions[-1], len(sessions), '1d', 'price', 'daily'
+    )
+    return pd.DataFrame(prices.to_numpy(dtype=float), index=sessions, columns=found)
+
+
+def weekly_rebalance_rows(sessions, start):
+    """Row positions of the first session of each week on/after start (date_rules.week_start)."""
+    weeks = sessions.to_period('W')
+    first_of_week = np.r_[True, weeks[1:] != weeks[:-1]]
+    return np.flatnonzero(first_of_week & (sessions >= pd.Timestamp(start)))
+
+
+def _attach(name, shape, dtype, config):
+    """Pool initializer: map the shared close matrix into this worker."""
+    global _shm, _closes, _config
+    try:
+        _shm = shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        _shm = shared_memory.SharedMemory(name=name)
+    _closes = np.ndarray(shape, dtype=dtype, buffer=_shm.buf)
+    _config = config
+
+
+def _solve_one(end_row):
+    """Pre-leverage weights for the rebalance on session end_row.
+
+    Mirrors NSERiskfolioStrategy.generate_signals: the lookback closes of the sessions before
+    end_row (the rebalance day's close is not known at the open), screen_returns, Riskfolio MV
+    risk parity. An empty Series means "hold nothing"; None means the optimization failed and
+    the strategy should solve that date itself.
+    """
+    lookback = _config['lookback']
+    window = _closes[max(0, end_row - lookback):end_row]
+    prices = pd.DataFrame(window, columns=_config['symbols'])
+
+    screened, returns = screen_returns(prices, _config['min_volatility'], _config['max_volatility'])
+    if len(screened) < 3:  # Need minimum assets for diversification
+        return pd.Series(dtype=float)
+    if returns.empty or len(returns.columns) < 2:
+        return pd.Series(dtype=float)
+
+    try:
+        return riskfolio_weights(returns, _config['min_return_target'], _config['mu_halflife'])
+    except Exception:
+        return None
+
+
+def precompute_weights(closes, start, workers, **config):
+    """Solve every weekly rebalance in a process pool; returns {date: weights Series}."""
+    rows = weekly_rebalance_rows(closes.index, start)
+    array = np.ascontiguousarray(closes.to_numpy(dtype=np.float64))
+    config['symbols'] = list(closes.columns)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    try:
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_attach,
+            initargs=(shm.name, array.shape, array.dtype.str, config),
+        ) as pool:
+            solved = pool.map(_solve_one, rows)
+            weights = {
+                closes.index[row].date(): w
+                for row, w in zip(rows, solved)
+                if w is not None
+            }
+    finally:
+        shm.close()
+        shm.unlink()
+    return weights
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument('--start', type=str, default='2019-01-01')
+    p.add_argument('--end', type=str, default='2021-01-01')
+    p.add_argument('--bundle', type=str, default='nse-local-minute-bundle')
+    p.add_argument('--capital', type=float, default=100000)
+    p.add_argument('--leverage', type=float, default=1.2)
+    p.add_argument('--lookback', type=int, default=126)
+    p.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    p.add_argument('--mu-halflife', type=float, default=None)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    strategy_kwargs = dict(
+        lookback_window=args.lookback,
+        min_volatility=0.15,
+        max_volatility=0.60,
+        min_return_target=0.0008,
+        mu_halflife=args.mu_halflife,
+    )
+
+    # Built first so a bad configuration fails before the pool spins up
+    strategy = NSERiskfolioStrategy(leverage=args.leverage, **strategy_kwargs)
+
+    print("🚀 NSE Riskfolio demo: precomputing rebalance weights")
+    closes = load_closes(args.bundle, SYMBOLS, args.start, args.end, args.lookback)
+    weights = precompute_weights(
+        closes, args.start, args.workers,
+        lookback=args.lookback,
+        min_volatility=strategy_kwargs['min_volatility'],
+        max_volatility=strategy_kwargs['max_volatility'],
+        min_return_target=strategy_kwargs['min_return_target'],
+        mu_halflife=strategy_kwargs['mu_halflife'],
+    )
+    print(f"✅ Solved {len(weights)} rebalance dates with {args.workers} workers")
+
+    strategy.precomputed_weights = weights
+    runner = EnhancedZiplineRunner(
+        strategy=strategy,
+        bundle=args.bundle,
+        start_date=args.start,
+        end_date=args.end,
+        capital_base=args.capital,
+        benchmark_symbol='NIFTY50'
+    )
+
+    print("🔄 Running backtest...")
+    results = runner.run()
+    if results is not None:
+        print("✅ Backtest completed successfully!")
+        total_return, annual_return, volatility, sharpe, max_drawdown, win_rate = summarize(results['returns'])
+        print("\n".join([
+            f"📈 Total Return: {total_return * 100:.2f}% (annualized {annual_return * 100:.2f}%)",
+            f"📊 Annualized Volatility: {volatility * 100:.2f}%",
+            f"⚡ Sharpe Ratio: {sharpe:.2f}",
+            f"📉 Maximum Drawdown: {max_drawdown * 100:.2f}%",
+            f"🎯 Win Rate: {win_rate * 100:.2f}%",
+        ]))
+
+
+if __name__ == '__main__':
+    main()
@@ -12,12 +12,8 @@ This strategy uses Bollinger Bands to identify breakout opportunities. The strat
 Author: NSE Backtesting Engine
 """
 
-import sys
 import os
 
-# Add parent directory to Python path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from engine.enhanced_base_strategy import BaseStrategy
 from zipline.api import symbol, record
 import pandas as pd
@@ -14,12 +14,6 @@ Strategy Logic:
 - Use built-in risk management from BaseStrategy
 """
 
-import sys
-import os
-
-# Add parent directory to Python path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from engine.enhanced_base_strategy import BaseStrategy
 from engine.enhanced_zipline_runner import EnhancedZiplineRunner
 
@@ -391,7 +385,7 @@ if __name__ == "__main__":
     
     print("\n📚 TO RUN:")
     print("1. Copy this file to strategies/mean_reversion_strategy.py")
-    print("2. Run: python strategies/mean_reversion_strategy.py")
+    print("2. Run: python -m strategies.mean_reversion_strategy")
     print("3. Or import and call run_mean_reversion_backtest()")
     
     print("\n" + "=" * 60)
@@ -29,11 +29,6 @@ Date: 2025-07-07
 import numpy as np
 import pandas as pd
 from zipline.api import symbol, record
-import sys
-import os
-
-# Add parent directory to Python path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from engine.enhanced_base_strategy import BaseStrategy
 
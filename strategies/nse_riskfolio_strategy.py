@@ -34,19 +34,119 @@ Strategy Logic:
 import numpy as np
 import pandas as pd
 import riskfolio as rp
-from zipline.api import symbol, get_datetime, record
-import sys
-import os
-
-# Add parent directory to Python path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sklearn.covariance import ledoit_wolf
+from zipline.api import (
+    symbol, get_datetime, record, order_target_percent,
+    schedule_function, date_rules, time_rules
+)
 
 from engine.enhanced_base_strategy import BaseStrategy
+from engine._risk_parity import RiskParityProblem, CVXPY_AVAILABLE
 import warnings
 
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
 
+# Per-process RiskParityProblem cache keyed by universe size (the NSE universe rarely changes,
+# so after the first rebalance each solve only updates parameter values)
+_RP_PROBLEMS = {}
+
+
+def _cached_risk_parity(mu, cov, min_return_target):
+    """Weights from the cached CVXPY problem, or None if CVXPY is missing or the solve fails"""
+    if not CVXPY_AVAILABLE:
+        return None
+    try:
+        n_assets = len(mu)
+        problem = _RP_PROBLEMS.get(n_assets)
+        if problem is None:
+            problem = _RP_PROBLEMS[n_assets] = RiskParityProblem(n_assets)
+        return problem.solve(mu, cov, min_return_target)
+    except Exception as e:
+        print(f"⚠️  Cached risk parity solve failed, using Riskfolio: {e}")
+        return None
+
+
+def screen_returns(prices, min_volatility, max_volatility):
+    """
+    Volatility screen and optimizer returns for a (sessions x assets) close frame.
+
+    Shared by NSERiskfolioStrategy and the precompute workers in examples/nse_riskfolio_demo.py
+    so both apply the same rules:
+    - screen: >= 60 closes, >= 20 returns, annualized volatility within [min, max]
+    - returns: screened columns with >= 80% of the window, complete rows only,
+      all-zero columns removed
+    Returns (screened column labels, returns DataFrame).
+    """
+    P = prices.to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        R = P[1:] / P[:-1] - 1.0
+        volatility = np.nanstd(R, axis=0, ddof=1) * np.sqrt(252)  # Annualized
+    n_closes = (~np.isnan(P)).sum(axis=0)
+    keep = (
+        (n_closes >= 60)
+        & ((~np.isnan(R)).sum(axis=0) >= 20)
+        & (volatility >= min_volatility)
+        & (volatility <= max_volatility)
+    )
+    screened = list(prices.columns[keep])
+    
+    # Complete-day returns of the screened columns with enough data (allow some missing days)
+    cols = keep & (n_closes >= len(P) * 0.8)
+    P = P[:, cols]
+    complete = ~np.isnan(P).any(axis=1)
+    P = P[complete]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        R = P[1:] / P[:-1] - 1.0
+    returns = pd.DataFrame(R, index=prices.index[complete][1:], columns=prices.columns[cols])
+    returns = returns.loc[:, (returns != 0).any(axis=0)]
+    return screened, returns
+
+
+def ewma_mean(R, halflife):
+    """Bias-corrected exponentially weighted mean of the rows of R (newest last), per column"""
+    weights = 0.5 ** (np.arange(len(R))[::-1] / halflife)
+    return weights @ R / weights.sum()
+
+
+def riskfolio_weights(returns, min_return_target, mu_halflife=None):
+    """
+    Risk-parity weights (model="Classic", rm="MV") for a returns DataFrame, as a Series
+    indexed like returns.columns, or None if Riskfolio finds no solution.
+    Module-level so precompute workers can run it without a strategy instance.
+    Expected returns are the window mean, or the EWMA with mu_halflife (days) when given.
+    """
+    # Calculate statistics (method_mu="hist", method_cov="ledoit") directly on the array
+    R = returns.to_numpy(dtype=float)
+    mu = R.mean(axis=0) if not mu_halflife else ewma_mean(R, mu_halflife)
+    cov = ledoit_wolf(R)[0]
+    
+    # Warm-started cached problem first; Riskfolio rebuilds the whole problem per call
+    weights = _cached_risk_parity(mu, cov, min_return_target)
+    if weights is not None:
+        return pd.Series(weights, index=returns.columns, name='weights')
+    
+    # Create Riskfolio portfolio object
+    port = rp.Portfolio(returns=returns)
+    port.mu = pd.DataFrame(mu[None, :], columns=returns.columns)
+    port.cov = pd.DataFrame(cov, index=returns.columns, columns=returns.columns)
+    
+    # Set minimum expected return
+    port.lowerret = min_return_target
+    
+    # Optimize portfolio (model="Classic", rm="MV")
+    weights = port.rp_optimization(
+        model="Classic",  # Classic mean-variance
+        rm="MV",         # Mean-Variance
+        b=None           # No benchmark
+    )
+    
+    if weights is not None and not weights.empty:
+        # Convert to Series with proper index
+        return weights.iloc[:, 0]  # First column contains weights
+    
+    return None
+
 
 class NSERiskfolioStrategy(BaseStrategy):
     """
@@ -61,7 +161,9 @@ class NSERiskfolioStrategy(BaseStrategy):
                  lookback_window=126,    # 6 months of trading days (21*6)
                  min_volatility=0.15,    # Minimum annualized volatility
                  max_volatility=0.60,    # Maximum annualized volatility
-                 min_return_target=0.0008):  # Minimum expected return
+                 min_return_target=0.0008,  # Minimum expected return
+                 precomputed_weights=None,  # {date: Series(symbol -> weight)} solved ahead of time
+                 mu_halflife=None):  # EWMA half-life (days) for expected returns; None = window mean
         """
         Initialize the NSE Riskfolio Strategy
         
@@ -77,6 +179,14 @@ class NSERiskfolioStrategy(BaseStrategy):
             Maximum volatility threshold for asset selection
         min_return_target : float
             Minimum expected return for optimization
+        precomputed_weights : dict, optional
+            Pre-leverage weights per rebalance date, keyed by asset symbol
+            (see examples/nse_riskfolio_demo.py); those dates skip the in-loop optimization,
+            except the first, which is also solved in-loop as a consistency check
+        mu_halflife : float, optional
+            Use an exponentially weighted mean of the window's daily returns with this
+            half-life as the optimizer's expected returns (pass the same value to the
+            precompute demo so every rebalance uses one estimator)
         """
         super().__init__()
         
@@ -86,25 +196,55 @@ class NSERiskfolioStrategy(BaseStrategy):
         self.min_volatility = min_volatility
         self.max_volatility = max_volatility
         self.min_return_target = min_return_target
+        self.precomputed_weights = precomputed_weights
+        self.mu_halflife = mu_halflife
         
         # Risk management - more conservative for NSE
-        self.risk_params.update({
+        self.risk_params = {
             'max_leverage': leverage,
             'max_position_size': 0.25,    # 25% max per position
             'stop_loss_pct': 0.08,        # 8% stop loss
             'take_profit_pct': 0.25,      # 25% take profit
             'daily_loss_limit': -0.05     # 5% daily loss limit
-        })
+        }
         
         # Track optimization results
         self.last_optimization_date = None
         self.optimization_weights = {}
         self.screened_assets = []
+        self._precomputed_checked = False
+        
+        # Column-major close window (sessions x assets), double-buffered so the last
+        # lookback_window rows are always one contiguous slice; see before_trading_start
+        self._price_buf = None
+        self._buf_assets = []
+        self._buf_pos = 0
+        self._buf_rows = 0
+        
+        print("\n".join([
+            "🚀 NSE Riskfolio Strategy initialized",
+            f"   📊 Leverage: {leverage}x",
+            f"   📅 Lookback: {lookback_window} days",
+            f"   📈 Volatility range: {min_volatility:.1%} - {max_volatility:.1%}",
+        ]))
+    
+    def initialize(self, context):
+        """Universe + weekly rebalance (first session of each week, as in the precompute demo)"""
+        context.universe = self.select_universe(context)
+        schedule_function(self.rebalance, date_rules.week_start(), time_rules.market_open(minutes=30))
+    
+    def rebalance(self, context, data):
+        """Target generate_signals' weights, capped at max_position_size per asset"""
+        signals = self.generate_signals(context, data)
+        if not signals:
+            return
         
-        print(f"🚀 NSE Riskfolio Strategy initialized")
-        print(f"   📊 Leverage: {leverage}x")
-        print(f"   📅 Lookback: {lookback_window} days")
-        print(f"   📈 Volatility range: {min_volatility:.1%} - {max_volatility:.1%}")
+        cap = self.risk_params['max_position_size']
+        tradeable = data.can_trade(list(signals))  # one batched check
+        for asset, weight in signals.items():
+            if tradeable[asset]:
+                order_target_percent(asset, float(np.clip(weight, -cap, cap)))
+        self.last_optimization_date = get_datetime().date()
     
     def select_universe(self, context):
         """
@@ -124,6 +264,44 @@ class NSERiskfolioStrategy(BaseStrategy):
         
         return nse_assets
     
+    def before_trading_start(self, context, data):
+        """
+        Append the previous session's closes to the price window (one row per day)
+        
+        The runner calls this one minute after the open, when the last daily bar is today's
+        partial one, so the row is the first of a two-bar history.
+        """
+        assets = list(getattr(context, 'universe', None) or [])
+        if not assets:
+            return
+        
+        lookback = self.lookback_window
+        if self._price_buf is None or assets != self._buf_assets:
+            self._price_buf = np.full((2 * lookback, len(assets)), np.nan, order='F')
+            self._buf_assets = assets
+            self._buf_pos = 0
+            self._buf_rows = 0
+        
+        row = data.history(assets, 'price', 2, '1d').to_numpy(dtype=float)[0]
+        # Write the row twice so buf[pos : pos + lookback] never wraps around
+        self._price_buf[self._buf_pos] = row
+        self._price_buf[self._buf_pos + lookback] = row
+        self._buf_pos = (self._buf_pos + 1) % lookback
+        self._buf_rows += 1
+    
+    def _price_window(self, context, data):
+        """
+        (lookback x assets) closes of the sessions before today, or None until the buffer
+        has warmed up (the data.history path covers those early rebalances)
+        """
+        lookback = self.lookback_window
+        if self._price_buf is None or self._buf_rows < lookback or context.universe != self._buf_assets:
+            return None
+        
+        # Oldest -> newest
+        start = self._buf_pos
+        return pd.DataFrame(self._price_buf[start:start + lookback], columns=self._buf_assets)
+    
     def generate_signals(self, context, data):
         """
         Generate portfolio weights using Riskfolio optimization
@@ -131,27 +309,31 @@ class NSERiskfolioStrategy(BaseStrategy):
         """
         current_date = get_datetime().date()
         
-        # Screen assets based on volatility and data availability
-        screened_assets = self._screen_assets(context, data)
+        # Weights already solved for this date in a parallel precompute pass: just look them up
+        if self.precomputed_weights is not None and current_date in self.precomputed_weights:
+            optimal_weights = self.precomputed_weights[current_date] * self.leverage
+            by_symbol = {asset.symbol: asset for asset in context.universe}
+            signals = {asset: 0.0 for asset in context.universe}
+            for asset_symbol, weight in optimal_weights.items():
+                if asset_symbol in by_symbol:
+                    signals[by_symbol[asset_symbol]] = weight
+            if not self._precomputed_checked:
+                self._check_precomputed(context, data, self.precomputed_weights[current_date])
+            return signals
+        
+        # Screen assets and build the optimizer's returns with the shared rules
+        # (from the rolling price window once it has warmed up)
+        window = self._price_window(context, data)
+        prices = window if window is not None else self._history_prices(context, data)
+        screened_assets, returns = screen_returns(prices, self.min_volatility, self.max_volatility)
+        self.screened_assets = screened_assets
+        print(f"📊 Screened {len(screened_assets)} assets from {len(context.universe)} total")
         
         if len(screened_assets) < 3:  # Need minimum assets for diversification
             print(f"⚠️  Insufficient assets after screening: {len(screened_assets)}")
             return {asset: 0.0 for asset in context.universe}
         
-        # Get historical price data for screened assets
         try:
-            prices_data = self._get_historical_prices(screened_assets, data)
-            if prices_data is None or prices_data.empty:
-                print("⚠️  No price data available for optimization")
-                return {asset: 0.0 for asset in context.universe}
-            
-            # Calculate returns
-            returns = prices_data.pct_change().dropna()
-            
-            # Remove assets with insufficient data or zero variance
-            returns = returns.loc[:, (returns != 0).any(axis=0)]
-            returns = returns.dropna(axis=1, how='any')
-            
             if returns.empty or len(returns.columns) < 2:
                 print("⚠️  Insufficient return data for optimization")
                 return {asset: 0.0 for asset in context.universe}
@@ -163,23 +345,21 @@ class NSERiskfolioStrategy(BaseStrategy):
                 # Apply leverage
                 optimal_weights *= self.leverage
                 
-                # Convert to signals dictionary for all universe assets
+                # Convert to signals dictionary for all universe assets (returns columns are Assets)
                 signals = {asset: 0.0 for asset in context.universe}
-                
-                for asset_symbol, weight in optimal_weights.items():
-                    # Find matching asset in universe
-                    for asset in context.universe:
-                        if str(asset).split('(')[1].split(')')[0] == asset_symbol:
-                            signals[asset] = weight
-                            break
+                signals.update(optimal_weights.items())
                 
                 # Record optimization metrics
                 self._record_optimization_metrics(context, optimal_weights, returns)
                 
-                print(f"✅ Portfolio optimized with {len(optimal_weights)} assets")
-                for asset_symbol, weight in optimal_weights.items():
-                    if abs(weight) > 0.01:  # Only show meaningful weights
-                        print(f"   📊 {asset_symbol}: {weight:.1%}")
+                # One print per rebalance instead of one per asset
+                lines = [f"✅ Portfolio optimized with {len(optimal_weights)} assets"]
+                lines.extend(
+                    f"   📊 {asset.symbol}: {weight:.1%}"
+                    for asset, weight in optimal_weights.items()
+                    if abs(weight) > 0.01  # Only show meaningful weights
+                )
+                print("\n".join(lines))
                 
                 return signals
             
@@ -191,67 +371,36 @@ class NSERiskfolioStrategy(BaseStrategy):
         # Fallback to equal weights if optimization fails
         return self._fallback_equal_weights(context)
     
-    def _screen_assets(self, context, data):
+    def _check_precomputed(self, context, data, weights, tol=1e-4):
         """
-        Screen assets based on volatility and data availability
-        Similar to the pipeline screening in your example
+        Solve the first precomputed date in-loop too and compare, so a precompute pass that
+        saw different prices (e.g. unadjusted closes) is reported instead of silently traded
         """
-        screened = []
+        self._precomputed_checked = True
+        window = self._price_window(context, data)
+        prices = window if window is not None else self._history_prices(context, data)
+        screened_assets, returns = screen_returns(prices, self.min_volatility, self.max_volatility)
+        live = pd.Series(dtype=float)
+        if len(screened_assets) >= 3 and len(returns.columns) >= 2:
+            live = self._compute_riskfolio_weights(returns)
+            if live is None:
+                print("⚠️  Precomputed weights not checked: in-loop optimization failed")
+                return
+            live.index = [asset.symbol for asset in live.index]
         
-        for asset in context.universe:
-            try:
-                # Get price history for volatility calculation
-                prices = data.history(asset, 'price', self.lookback_window, '1d')
-                
-                if len(prices) < 60:  # Need minimum data
-                    continue
-                
-                # Calculate annualized volatility
-                returns = prices.pct_change().dropna()
-                if len(returns) < 20:
-                    continue
-                
-                volatility = returns.std() * np.sqrt(252)  # Annualized
-                
-                # Apply volatility screen (similar to your example)
-                if self.min_volatility <= volatility <= self.max_volatility:
-                    screened.append(asset)
-                    
-            except Exception as e:
-                print(f"⚠️  Error screening {asset}: {e}")
-                continue
-        
-        self.screened_assets = screened
-        print(f"📊 Screened {len(screened)} assets from {len(context.universe)} total")
-        
-        return screened
+        diff = live.sub(weights, fill_value=0.0).abs()
+        max_diff = float(diff.max()) if len(diff) else 0.0
+        if max_diff > tol:
+            print(f"⚠️  Precomputed weights differ from the in-loop solve by up to {max_diff:.2%}")
+        else:
+            print(f"✅ Precomputed weights match the in-loop solve (max diff {max_diff:.1e})")
     
-    def _get_historical_prices(self, assets, data):
+    def _history_prices(self, context, data):
         """
-        Get historical price data for optimization
+        (lookback x assets) daily closes of completed sessions, in one history call
+        (today's partial bar is dropped, matching the precompute windows)
         """
-        try:
-            # Get price data for all screened assets
-            price_data = {}
-            
-            for asset in assets:
-                prices = data.history(asset, 'price', self.lookback_window, '1d')
-                if len(prices) >= self.lookback_window * 0.8:  # Allow some missing data
-                    asset_symbol = str(asset).split('(')[1].split(')')[0]
-                    price_data[asset_symbol] = prices
-            
-            if not price_data:
-                return None
-            
-            # Create DataFrame with aligned dates
-            prices_df = pd.DataFrame(price_data)
-            prices_df = prices_df.dropna()  # Remove rows with any NaN
-            
-            return prices_df
-            
-        except Exception as e:
-            print(f"❌ Error getting historical prices: {e}")
-            return None
+        return data.history(context.universe, 'price', self.lookback_window + 1, '1d').iloc[:-1]
     
     def _compute_riskfolio_weights(self, returns):
         """
@@ -259,28 +408,7 @@ class NSERiskfolioStrategy(BaseStrategy):
         This replicates the compute_weights function from your example
         """
         try:
-            # Create Riskfolio portfolio object
-            port = rp.Portfolio(returns=returns)
-            
-            # Calculate statistics (method_mu="hist", method_cov="ledoit")
-            port.assets_stats(method_mu="hist", method_cov="ledoit")
-            
-            # Set minimum expected return
-            port.lowerret = self.min_return_target
-            
-            # Optimize portfolio (model="Classic", rm="MV")
-            weights = port.rp_optimization(
-                model="Classic",  # Classic mean-variance
-                rm="MV",         # Mean-Variance
-                b=None           # No benchmark
-            )
-            
-            if weights is not None and not weights.empty:
-                # Convert to Series with proper index
-                weights_series = weights.iloc[:, 0]  # First column contains weights
-                return weights_series
-            
-            return None
+            return riskfolio_weights(returns, self.min_return_target, self.mu_halflife)
             
         except Exception as e:
             print(f"❌ Riskfolio optimization failed: {e}")
@@ -358,23 +486,14 @@ def main():
     if results is not None:
         print("✅ Backtest completed successfully!")
         
-        # Save results to pickle
-        pickle_path = runner.save_results_to_pickle(
-            filename="nse_riskfolio_strategy.pickle",
-            results_dir="riskfolio_results"
-        )
-        
-        if pickle_path:
-            # Create analysis
-            runner.create_pyfolio_analysis_from_pickle(
-                pickle_filepath=pickle_path,
-                results_dir="riskfolio_results/analysis",
-                save_plots=True,
-                save_csv=True
-            )
-        
-        # Standard analysis
-        runner.analyze('riskfolio_results/standard_analysis')
+        # PyFolio objects were already extracted by runner.analyze() during the run;
+        # use them in memory instead of pickling the full perf frame and reloading it
+        analysis = runner.analysis_objects
+        if analysis is not None:
+            print(f"📊 Returns: {len(analysis['returns'])} days")
+            print(f"📊 Positions: {analysis['positions'].shape}")
+            print(f"📊 Transactions: {len(analysis['transactions'])}")
+        print(f"💾 Analysis artifacts saved to: {runner.output_dir}")
         
     else:
         print("❌ Backtest failed")
@@ -13,12 +13,8 @@ for mean reversion trading. The strategy:
 Author: NSE Backtesting Engine
 """
 
-import sys
 import os
 
-# Add parent directory to Python path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from engine.enhanced_base_strategy import BaseStrategy
 from zipline.api import symbol, record, order_target_percent, get_open_orders, cancel_order, get_datetime
 import pandas as pd
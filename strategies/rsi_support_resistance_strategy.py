@@ -14,23 +14,73 @@ The strategy:
 Author: NSE Backtesting Engine
 """
 
-import sys
 import os
 
-# Add parent directory to Python path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from engine.enhanced_base_strategy import BaseStrategy
 from zipline.api import symbol, record, order_target_percent, get_datetime
-import pandas as pd
 import numpy as np
 import logging
 
+# Optional JIT acceleration for the RSI kernel
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Create logger for RSI S/R strategy
 rsi_sr_logger = logging.getLogger('rsi_sr_strategy')
 rsi_sr_logger.setLevel(logging.INFO)
 
 
+def _wilder_rsi(close, period):
+    """Latest Wilder-smoothed RSI in one O(N) pass (avg gain/loss carried as scalars)"""
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, period + 1):
+        delta = close[i] - close[i - 1]
+        if delta > 0:
+            avg_gain += delta
+        else:
+            avg_loss -= delta
+    avg_gain /= period
+    avg_loss /= period
+    for i in range(period + 1, close.size):
+        delta = close[i] - close[i - 1]
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+    if avg_loss == 0.0:
+        return 100.0 if avg_gain > 0.0 else 50.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+def _wilder_rsi_batch(closes, period):
+    """Latest RSI per column of a (bars x assets) close matrix.
+
+    Each column is compacted to its non-NaN bars first (a per-column dropna()); columns
+    with fewer than period + 1 bars get the neutral 50.
+    """
+    n_bars, n_assets = closes.shape
+    out = np.empty(n_assets)
+    for j in range(n_assets):
+        column = closes[:, j]
+        close = column[~np.isnan(column)]
+        if close.size < period + 1:
+            out[j] = 50.0
+        else:
+            out[j] = _wilder_rsi(close, period)
+    return out
+
+
+if NUMBA_AVAILABLE:
+    _wilder_rsi = njit(cache=True)(_wilder_rsi)
+    _wilder_rsi_batch = njit(cache=True)(_wilder_rsi_batch)
+    # Compile (or load from the on-disk cache) at import so the first bar doesn't pay for it
+    _wilder_rsi_batch(np.zeros((32, 2)), 14)
+
+
 class RSISupportResistanceStrategy(BaseStrategy):
     """
     RSI strategy with Support/Resistance based stop losses and profit targets.
@@ -86,23 +136,6 @@ class RSISupportResistanceStrategy(BaseStrategy):
         except Exception:
             return [symbol('SBIN')]
 
-    def calculate_rsi(self, prices, period=14):
-        """Calculate RSI - same as original strategy"""
-        if len(prices) < period + 1:
-            return 50
-        
-        delta = prices.diff()
-        gains = delta.where(delta > 0, 0)
-        losses = -delta.where(delta < 0, 0)
-        
-        avg_gains = gains.rolling(window=period).mean()
-        avg_losses = losses.rolling(window=period).mean()
-        
-        rs = avg_gains / avg_losses
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50
-
     def identify_support_resistance(self, prices, highs=None, lows=None):
         """
         Identify Support and Resistance levels using pivot point analysis.
@@ -123,20 +156,17 @@ class RSISupportResistanceStrategy(BaseStrategy):
         if len(prices) < self.lookback_period:
             return [], []
         
-        support_levels = []
-        resistance_levels = []
-        
-        # Find local minima (potential support) and maxima (potential resistance)
-        for i in range(2, len(prices) - 2):
-            # Local minimum (support)
-            if (lows.iloc[i] < lows.iloc[i-1] and lows.iloc[i] < lows.iloc[i-2] and
-                lows.iloc[i] < lows.iloc[i+1] and lows.iloc[i] < lows.iloc[i+2]):
-                support_levels.append(lows.iloc[i])
-            
-            # Local maximum (resistance)
-            if (highs.iloc[i] > highs.iloc[i-1] and highs.iloc[i] > highs.iloc[i-2] and
-                highs.iloc[i] > highs.iloc[i+1] and highs.iloc[i] > highs.iloc[i+2]):
-                resistance_levels.append(highs.iloc[i])
+        # Find local minima (potential support) and maxima (potential resistance):
+        # a bar is a pivot when it is strictly below/above the two bars on each side.
+        # Shifted-slice comparisons evaluate every window at once instead of per-bar .iloc calls.
+        lo = lows.to_numpy(dtype=np.float64)
+        hi = highs.to_numpy(dtype=np.float64)
+        lo_mid = lo[2:-2]
+        hi_mid = hi[2:-2]
+        support_mask = (lo_mid < lo[1:-3]) & (lo_mid < lo[:-4]) & (lo_mid < lo[3:-1]) & (lo_mid < lo[4:])
+        resistance_mask = (hi_mid > hi[1:-3]) & (hi_mid > hi[:-4]) & (hi_mid > hi[3:-1]) & (hi_mid > hi[4:])
+        support_levels = lo_mid[support_mask]
+        resistance_levels = hi_mid[resistance_mask]
         
         # Cluster similar levels together
         support_levels = self._cluster_levels(support_levels, prices.iloc[-1])
@@ -150,46 +180,35 @@ class RSISupportResistanceStrategy(BaseStrategy):
 
     def _cluster_levels(self, levels, current_price):
         """Group similar price levels together"""
-        if not levels:
+        if len(levels) == 0:
             return []
         
-        levels = sorted(levels)
-        clustered = []
-        current_cluster = [levels[0]]
-        
-        for level in levels[1:]:
-            if abs(level - current_cluster[-1]) / current_price <= self.sr_tolerance:
-                current_cluster.append(level)
-            else:
-                # Average the cluster
-                clustered.append(np.mean(current_cluster))
-                current_cluster = [level]
-        
-        # Add the last cluster
-        clustered.append(np.mean(current_cluster))
+        # After sorting, a new cluster starts wherever the gap to the previous level exceeds
+        # the tolerance; cumsum of those breaks labels the clusters, bincount averages them
+        levels = np.sort(np.asarray(levels, dtype=np.float64))
+        breaks = ~(np.abs(np.diff(levels)) / current_price <= self.sr_tolerance)
+        cluster = np.concatenate(([0], np.cumsum(breaks)))
+        clustered = np.bincount(cluster, weights=levels) / np.bincount(cluster)
         
-        return clustered
+        return clustered.tolist()
 
     def _validate_levels(self, levels, price_series, is_support=True):
         """Validate S/R levels by counting touches"""
-        validated_levels = []
+        if len(levels) == 0:
+            return []
         
-        for level in levels:
-            touches = 0
-            for price in price_series:
-                if is_support:
-                    # Count touches near support (price came close to level from above)
-                    if abs(price - level) / level <= self.sr_tolerance and price >= level * 0.98:
-                        touches += 1
-                else:
-                    # Count touches near resistance (price came close to level from below)
-                    if abs(price - level) / level <= self.sr_tolerance and price <= level * 1.02:
-                        touches += 1
-            
-            if touches >= self.min_touches:
-                validated_levels.append(level)
+        # (levels x bars) comparison matrix instead of a Python loop per level and bar
+        level = np.asarray(levels, dtype=np.float64)[:, None]
+        price = np.asarray(price_series, dtype=np.float64)[None, :]
+        near = np.abs(price - level) / level <= self.sr_tolerance
+        if is_support:
+            # Count touches near support (price came close to level from above)
+            touches = (near & (price >= level * 0.98)).sum(axis=1)
+        else:
+            # Count touches near resistance (price came close to level from below)
+            touches = (near & (price <= level * 1.02)).sum(axis=1)
         
-        return validated_levels
+        return level[touches >= self.min_touches, 0].tolist()
 
     def get_nearest_support_resistance(self, current_price, support_levels, resistance_levels):
         """Find the nearest support below and resistance above current price"""
@@ -209,26 +228,35 @@ class RSISupportResistanceStrategy(BaseStrategy):
         """
         signals = {}
 
+        # Historical data for the whole universe in one call per field
+        history_length = max(self.rsi_period + 10, self.lookback_period + 10)
+        price_panel = data.history(context.universe, 'price', history_length, '1d')
+
+        # Try to get OHLC data for better S/R analysis
+        try:
+            high_panel = data.history(context.universe, 'high', history_length, '1d')
+            low_panel = data.history(context.universe, 'low', history_length, '1d')
+        except:
+            high_panel = price_panel
+            low_panel = price_panel
+
+        # RSI for every asset in one (Numba-compiled, when available) kernel call
+        rsi_by_asset = dict(zip(
+            price_panel.columns,
+            _wilder_rsi_batch(price_panel.to_numpy(dtype=np.float64), self.rsi_period)
+        ))
+
         for asset in context.universe:
             try:
-                # Get historical data
-                history_length = max(self.rsi_period + 10, self.lookback_period + 10)
-                prices = data.history(asset, 'price', history_length, '1d')
-
-                # Try to get OHLC data for better S/R analysis
-                try:
-                    highs = data.history(asset, 'high', history_length, '1d')
-                    lows = data.history(asset, 'low', history_length, '1d')
-                except:
-                    highs = prices
-                    lows = prices
+                prices = price_panel[asset]
+                highs = high_panel[asset]
+                lows = low_panel[asset]
 
                 if len(prices) < self.rsi_period + 1:
                     signals[asset] = 0.0
                     continue
 
-                # Calculate RSI
-                current_rsi = self.calculate_rsi(prices, self.rsi_period)
+                current_rsi = rsi_by_asset[asset]
                 current_price = prices.iloc[-1]
 
                 # Debug: Log RSI values
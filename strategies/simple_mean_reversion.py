@@ -7,14 +7,9 @@ This maintains the simplicity of the original example while using
 BaseStrategy only for the essential framework.
 """
 
-import sys
-import os
 import pandas as pd
 import numpy as np
 
-# Add parent directory to Python path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from engine.enhanced_base_strategy import BaseStrategy
 from engine.enhanced_zipline_runner import EnhancedZiplineRunner
 from zipline.api import (
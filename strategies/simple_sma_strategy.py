@@ -7,12 +7,6 @@ This is the EXACT strategy you should use to start.
 No confusion, no complexity, just clean SMA crossover.
 """
 
-import sys
-import os
-
-# Add parent directory to Python path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from engine.enhanced_base_strategy import BaseStrategy
 from zipline.api import symbol, schedule_function, date_rules, time_rules
 import numpy as np
@@ -197,7 +191,7 @@ if __name__ == "__main__":
     
     print("\n🚀 TO RUN THIS STRATEGY:")
     print("1. Copy this file to strategies/simple_sma_strategy.py")
-    print("2. Run: python strategies/simple_sma_strategy.py")
+    print("2. Run: python -m strategies.simple_sma_strategy")
     print("3. Check results")
     print("4. Only modify if needed!")
     
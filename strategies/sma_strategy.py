@@ -1,9 +1,3 @@
-import sys
-import os
-
-# Add parent directory to Python path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from engine.enhanced_base_strategy import BaseStrategy
 from engine.enhanced_zipline_runner import EnhancedZiplineRunner
 
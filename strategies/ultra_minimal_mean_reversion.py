@@ -7,13 +7,9 @@ This is as close as possible to the original example while
 still using your BaseStrategy for the minimal framework.
 """
 
-import sys
-import os
 import pandas as pd
 import numpy as np
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from engine.enhanced_base_strategy import BaseStrategy
 from engine.enhanced_zipline_runner import EnhancedZiplineRunner
 from zipline.api import symbol, schedule_function, date_rules, time_rules, record, order_target_percent, get_datetime
@@ -13,7 +13,6 @@ import numpy as np
 from typing import Dict, List, Tuple, Optional, Union
 from datetime import datetime, timedelta
 import logging
-from scipy import stats
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 import warnings
@@ -26,9 +25,54 @@ except ImportError:
     TALIB_AVAILABLE = False
     warnings.warn("TA-Lib not available. Using custom implementations.")
 
+# Optional JIT acceleration
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
+def _moments_numpy(r: np.ndarray) -> Tuple[float, float, float, float]:
+    """Mean, population std, skewness and excess kurtosis sharing one mean/deviation pass"""
+    n = r.size
+    m = r.sum() / n
+    d = r - m
+    d2 = d * d
+    v = d2.sum() / n
+    if v == 0:
+        return m, 0.0, np.nan, np.nan
+    return m, np.sqrt(v), (d2 * d).sum() / (n * v ** 1.5), (d2 * d2).sum() / (n * v * v) - 3.0
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _moments(r):
+        """Numba version of _moments_numpy (single loop, no temporaries)"""
+        n = r.size
+        m = 0.0
+        for i in range(n):
+            m += r[i]
+        m /= n
+        s2 = 0.0
+        s3 = 0.0
+        s4 = 0.0
+        for i in range(n):
+            d = r[i] - m
+            d2 = d * d
+            s2 += d2
+            s3 += d2 * d
+            s4 += d2 * d2
+        v = s2 / n
+        if v == 0.0:
+            return m, 0.0, np.nan, np.nan
+        return m, np.sqrt(v), s3 / (n * v ** 1.5), s4 / (n * v * v) - 3.0
+else:
+    _moments = _moments_numpy
+
+
 class TechnicalIndicators:
     """Advanced technical indicators"""
     
@@ -205,21 +249,30 @@ class RiskMetrics:
     @staticmethod
     def calculate_risk_adjusted_metrics(returns: pd.Series, risk_free_rate: float = 0.02) -> Dict:
         """Calculate comprehensive risk-adjusted metrics"""
-        if len(returns) == 0:
+        # Mean/std/skew/kurtosis from a single moments pass (matches scipy's biased skew/kurtosis)
+        r = returns.dropna().to_numpy(dtype=np.float64)
+        n = r.size
+        if n == 0:
             return {}
         
-        annual_returns = returns.mean() * 252
-        annual_vol = returns.std() * np.sqrt(252)
+        mean, pop_std, skewness, kurtosis = _moments(r)
+        std = pop_std * np.sqrt(n / (n - 1)) if n > 1 else np.nan
+        
+        annual_returns = mean * 252
+        annual_vol = std * np.sqrt(252)
+        max_dd = RiskMetrics.calculate_maximum_drawdown(returns)['max_drawdown']
+        losses = r[r < 0]
+        downside_deviation = losses.std(ddof=1) * np.sqrt(252) if losses.size > 1 else np.nan
         
         metrics = {
             'sharpe_ratio': (annual_returns - risk_free_rate) / annual_vol if annual_vol != 0 else 0,
-            'sortino_ratio': (annual_returns - risk_free_rate) / (returns[returns < 0].std() * np.sqrt(252)) if len(returns[returns < 0]) > 0 else 0,
-            'calmar_ratio': annual_returns / abs(RiskMetrics.calculate_maximum_drawdown(returns)['max_drawdown']) if RiskMetrics.calculate_maximum_drawdown(returns)['max_drawdown'] != 0 else 0,
+            'sortino_ratio': (annual_returns - risk_free_rate) / downside_deviation if losses.size > 0 else 0,
+            'calmar_ratio': annual_returns / abs(max_dd) if max_dd != 0 else 0,
             'var_95': RiskMetrics.calculate_value_at_risk(returns, 0.05),
             'cvar_95': RiskMetrics.calculate_conditional_var(returns, 0.05),
-            'skewness': stats.skew(returns.dropna()),
-            'kurtosis': stats.kurtosis(returns.dropna()),
-            'downside_deviation': returns[returns < 0].std() * np.sqrt(252)
+            'skewness': skewness,
+            'kurtosis': kurtosis,
+            'downside_deviation': downside_deviation
         }
         
         return metrics